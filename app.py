@@ -1,4 +1,3 @@
-```python
 from flask import Flask, jsonify
 
 app = Flask(__name__)
@@ -13,4 +12,3 @@ def home():
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000)
-```
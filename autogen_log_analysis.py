@@ -4,8 +4,14 @@ import pandas as pd
 import numpy as np
 import os
 import sys
+import html
 from datetime import datetime, timedelta
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
+from llm_client import CustomLLMClient, init_backend
+from tracing import span, spans
+from profiling import run_profiled
+from reports import Report
+from log_templates import mine_files
+from log_shards import ANALYSIS_WORKERS, LogStats, analyze_sharded, mine_files_sharded, mock_log_frame
 
 # Debug: Print Python version and file path
 print(f"Python version: {sys.version}")
@@ -14,8 +20,7 @@ print(f"Running autogen_log_analysis.py from: {os.path.abspath(__file__)}")
 # Initialize GPT-2
 try:
     print("Initializing GPT-2 tokenizer and model...")
-    tokenizer = GPT2Tokenizer.from_pretrained("gpt2", force_download=True, clean_up_tokenization_spaces=True)
-    model = GPT2LMHeadModel.from_pretrained("gpt2", force_download=True)
+    init_backend()
     print("GPT-2 initialized successfully")
 except Exception as e:
     print(f"Failed to initialize GPT-2: {str(e)}")
@@ -36,34 +41,6 @@ except Exception as e:
 """)
     exit(1)
 
-# Custom LLM client
-class CustomLLMClient:
-    def create(self, params):
-        try:
-            prompt = params.get("prompt", "")
-            inputs = tokenizer(prompt, return_tensors="pt", max_length=512, truncation=True)
-            attention_mask = inputs["attention_mask"]
-            outputs = model.generate(
-                inputs["input_ids"],
-                attention_mask=attention_mask,
-                max_new_tokens=150,
-                do_sample=True,
-                pad_token_id=tokenizer.eos_token_id
-            )
-            response_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-            try:
-                if "```json" in response_text:
-                    json_part = response_text.split("```json")[-1].split("```")[0]
-                    response_json = json.loads(json_part)
-                else:
-                    response_json = {"message": response_text}
-            except Exception:
-                response_json = {"message": response_text}
-            return {"choices": [{"message": {"content": json.dumps(response_json)}}]}
-        except Exception as e:
-            print(f"LLM client error: {str(e)}")
-            return {"choices": [{"message": {"content": json.dumps({"error": str(e)})}}]}
-
 # Define log analyst agent
 try:
     print("Initializing LogAnalyst...")
@@ -72,7 +49,7 @@ try:
         llm_config=False,
         system_message="You are a Log Analyst. Analyze logs and generate an HTML report."
     )
-    log_analyst.llm_client = CustomLLMClient()
+    log_analyst.llm_client = CustomLLMClient(stage="analyze")
     print("LogAnalyst initialized successfully")
 except Exception as e:
     print(f"Failed to initialize LogAnalyst: {str(e)}")
@@ -93,20 +70,75 @@ except Exception as e:
 """)
     exit(1)
 
-# Generate mock logs
-def generate_mock_logs():
+MOCK_LOG_ROWS = int(os.getenv("MOCK_LOG_ROWS", "100"))
+# Raw log files (comma separated) mined into templates alongside the metrics
+LOG_FILES = [p for p in os.getenv("LOG_FILES", "").split(",") if p]
+TEMPLATE_LIMIT = int(os.getenv("LOG_TEMPLATE_LIMIT", "20"))
+
+def mock_start_time():
+    return pd.Timestamp(datetime.now() - timedelta(days=1))
+
+# Generate mock logs, one request per minute, built column-wise so large volumes stay cheap
+def generate_mock_logs(rows=MOCK_LOG_ROWS, seed=None):
     try:
-        start_time = datetime.now() - timedelta(days=1)
-        logs = []
-        for i in range(100):
-            timestamp = (start_time + timedelta(minutes=i)).isoformat()
-            response_time = np.random.exponential(0.1)
-            logs.append({"timestamp": timestamp, "response_time": response_time, "status": "success" if np.random.rand() > 0.1 else "failed"})
-        return pd.DataFrame(logs)
+        return mock_log_frame(rows, mock_start_time(), np.random.default_rng(seed))
     except Exception as e:
         print(f"Failed to generate mock logs: {str(e)}")
         return pd.DataFrame()
 
+# Top hotspots from the <agent>_profile.json files of the earlier stages. The analyze profile is
+# only written after analyze_logs returns, so reading it here would show the previous run.
+def render_hotspots(agents=("build", "test", "deploy"), limit=5):
+    sections = []
+    for agent in agents:
+        path = f"{agent}_profile.json"
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, "r") as f:
+                profile = json.load(f)
+        except Exception as e:
+            print(f"Failed to load {path}: {str(e)}")
+            continue
+        rows = []
+        for spot in profile.get("hotspots", [])[:limit]:
+            cost = f"{spot['tottime_s']:.3f}s self, {spot['cumtime_s']:.3f}s total" if "tottime_s" in spot else f"{spot['share']:.1%} of samples"
+            rows.append(f"        <tr><td>{html.escape(spot['function'])}</td><td>{cost}</td></tr>")
+        sections.append(f"""    <h2 class="text-xl font-semibold text-center text-gray-800 mt-6">Hotspots: {agent} ({profile.get('mode')}, {profile.get('elapsed_s')}s)</h2>
+    <table class="max-w-2xl mx-auto my-3">
+{chr(10).join(rows)}
+    </table>""")
+    return "\n".join(sections)
+
+def render_templates(templates):
+    rows = [f"        <tr><td>{t['count']}</td><td>{html.escape(t['template'])}</td></tr>" for t in templates["top"]]
+    return f"""    <h2 class="text-xl font-semibold text-center text-gray-800 mt-6">Log Templates ({templates['lines']} lines, {templates['noise_dropped']} probe lines dropped, {templates['templates']} templates)</h2>
+    <table class="max-w-2xl mx-auto my-3">
+{chr(10).join(rows)}
+    </table>"""
+
+# Cluster raw log lines into templates; the LLM only ever sees the compact template list
+def mine_log_templates(paths, report, workers=1):
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Log file {path} not found")
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return ""
+    with span("template mining", stage="analyze", files=len(paths)) as record:
+        miner = mine_files_sharded(paths, workers) if workers > 1 and len(paths) > 1 else mine_files(paths)
+        record["lines"] = miner.lines
+    templates = miner.summary(TEMPLATE_LIMIT)
+    report.details["log_templates"] = templates
+    print(f"Mined {templates['templates']} templates from {templates['lines']} lines "
+          f"({templates['noise_dropped']} probe lines dropped)")
+    if os.getenv("LOG_LLM_SUMMARY", "0") == "1":
+        response = log_analyst.llm_client.create({
+            "prompt": f"Summarize the problems in these log templates (count x template):\n{miner.compact(TEMPLATE_LIMIT)}"
+        })
+        report.details["log_summary"] = json.loads(response["choices"][0]["message"]["content"])
+    return render_templates(templates)
+
 # Index.html content
 index_html = """<!DOCTYPE html>
 <html lang="en">
@@ -164,15 +196,47 @@ index_html = """<!DOCTYPE html>
         <p>&copy; 2025 CI/CD Pipeline. Powered by GitHub Pages.</p>
     </footer>
     <script>
-        function renderReport(data, containerId) {
+        function renderReport(report, containerId) {
             const container = document.getElementById(containerId);
-            if (!data || Object.keys(data).length === 0) {
+            if (!report || !report.stage) {
                 container.innerHTML = '<p class="text-red-500">No data available.</p>';
                 return;
             }
+            const statusColor = report.status === 'success' ? 'text-green-600' : report.status === 'failed' ? 'text-red-500' : 'text-gray-600';
             let html = '<table>';
-            for (const [key, value] of Object.entries(data)) {
-                html += `<tr><th>${key}</th><td>${Array.isArray(value) ? value.join(', ') : value}</td></tr>`;
+            html += `<tr><th>status</th><td class="${statusColor}">${report.status}</td></tr>`;
+            html += `<tr><th>created_at</th><td>${report.created_at}</td></tr>`;
+            if (report.issues.length) {
+                const more = report.dropped_issues ? `<br>(+${report.dropped_issues} more)` : '';
+                html += `<tr><th>issues</th><td>${report.issues.join('<br>')}${more}</td></tr>`;
+            }
+            if (report.mitigations.length) {
+                html += `<tr><th>mitigations</th><td>${report.mitigations.join('<br>')}</td></tr>`;
+            }
+            const details = report.details;
+            for (const [key, value] of Object.entries(details)) {
+                if (key === 'baseline' || key === 'load_test') continue;
+                html += `<tr><th>${key}</th><td>${value !== null && typeof value === 'object' ? JSON.stringify(value) : value}</td></tr>`;
+            }
+            if (details.load_test) {
+                const overall = details.load_test.overall;
+                html += `<tr><th>load_test</th><td>${overall.requests} requests, ${overall.throughput_rps} req/s, p95 ${overall.latency_ms.p95} ms, errors ${(overall.error_rate * 100).toFixed(2)}%</td></tr>`;
+            }
+            if (details.baseline) {
+                for (const [endpoint, cmp] of Object.entries(details.baseline.endpoints)) {
+                    const delta = cmp.delta_ms === undefined ? 'no baseline'
+                        : `${cmp.baseline_p95_ms} &rarr; ${cmp.current_p95_ms} ms (${cmp.delta_ms >= 0 ? '+' : ''}${cmp.delta_ms} ms, ${cmp.delta_pct >= 0 ? '+' : ''}${cmp.delta_pct}%)`;
+                    const color = cmp.verdict === 'regress' ? 'text-red-500' : cmp.verdict === 'improve' ? 'text-green-600' : 'text-gray-600';
+                    html += `<tr><th>p95 ${endpoint}</th><td class="${color}">${delta} [${cmp.verdict}]</td></tr>`;
+                }
+            }
+            const phases = Object.entries(report.timings).map(([phase, seconds]) => `${phase}: ${seconds}s`);
+            if (phases.length) {
+                html += `<tr><th>phases</th><td>${phases.join('<br>')}</td></tr>`;
+            }
+            if (report.spans.length) {
+                const timings = report.spans.map(s => `${s.name}: ${(s.wall_ms / 1000).toFixed(2)}s (cpu ${(s.cpu_ms / 1000).toFixed(2)}s, rss ${s.peak_rss_mb} MB)`);
+                html += `<tr><th>timings</th><td>${timings.join('<br>')}</td></tr>`;
             }
             html += '</table>';
             container.innerHTML = html;
@@ -213,15 +277,24 @@ index_html = """<!DOCTYPE html>
 """
 
 # Analyze logs
-def analyze_logs(_):
-    summary = {"status": "unknown", "issues": [], "mitigations": []}
+# Single-process analysis of the whole frame, or sharded by time range across a process pool
+def collect_log_stats(log_rows, workers):
+    if workers > 1:
+        with span("sharded log analysis", stage="analyze", rows=log_rows, workers=workers):
+            return analyze_sharded(log_rows, mock_start_time(), workers)
+    with span("generate logs", stage="analyze") as record:
+        df = generate_mock_logs(log_rows)
+        record["rows"] = len(df)
+    with span("log analysis", stage="analyze", rows=len(df)):
+        return LogStats.from_frame(df)
+
+def analyze_logs(_, reports=None, log_rows=MOCK_LOG_ROWS, log_files=None, workers=ANALYSIS_WORKERS):
+    report = Report("analyze")
     try:
-        print("Starting log analysis...")
-        df = generate_mock_logs()
-        if df.empty:
-            summary["status"] = "failed"
-            summary["issues"].append("No logs generated")
-            summary["mitigations"].append("Check log generation logic")
+        print(f"Starting log analysis with {workers} worker(s)...")
+        stats = collect_log_stats(log_rows, workers)
+        if not stats.requests:
+            report.fail("No logs generated", "Check log generation logic")
             report_html = """
 <html>
 <head>
@@ -237,9 +310,8 @@ def analyze_logs(_):
 </html>
 """
         else:
-            total_requests = len(df)
-            success_rate = len(df[df["status"] == "success"]) / total_requests
-            avg_response_time = df["response_time"].mean()
+            metrics = stats.summary()
+            templates_html = mine_log_templates(LOG_FILES if log_files is None else log_files, report, workers)
             report_html = f"""
 <html>
 <head>
@@ -251,34 +323,43 @@ def analyze_logs(_):
 <body>
     <h1 class="text-2xl font-bold text-center text-gray-800 mt-4">Log Analysis Report</h1>
     <table class="max-w-2xl mx-auto my-5">
-        <tr><th>Total Requests</th><td>{total_requests}</td></tr>
-        <tr><th>Success Rate</th><td>{success_rate:.2%}</td></tr>
-        <tr><th>Average Response Time</th><td>{avg_response_time:.3f} seconds</td></tr>
+        <tr><th>Total Requests</th><td>{metrics['total_requests']}</td></tr>
+        <tr><th>Success Rate</th><td>{metrics['success_rate']:.2%}</td></tr>
+        <tr><th>Average Response Time</th><td>{metrics['avg_response_time']:.3f} seconds</td></tr>
+        <tr><th>p95 Response Time</th><td>{metrics['p95_response_time']:.3f} seconds</td></tr>
     </table>
+{templates_html}
+{render_hotspots()}
 </body>
 </html>
 """
-            summary["status"] = "success"
-            summary["total_requests"] = total_requests
-            summary["success_rate"] = success_rate
-            summary["avg_response_time"] = avg_response_time
+            report.status = "success"
+            report.details.update(metrics)
+            report.details["workers"] = workers
 
-        # Load JSON reports
-        reports = {}
-        for report_file in ["build_report.json", "test_report.json", "deploy_report.json"]:
+        # Load JSON reports, unless the caller already has them in memory
+        reports = dict(reports or {})
+        for stage in ["build", "test", "deploy"]:
+            report_file = f"{stage}_report.json"
+            if report_file in reports:
+                continue
             try:
                 print(f"Loading {report_file}...")
                 if os.path.exists(report_file):
                     with open(report_file, "r") as f:
-                        reports[report_file] = json.load(f)
-                    print(f"Loaded {report_file}: {json.dumps(reports[report_file], indent=2)}")
+                        reports[report_file] = Report.from_json(f.read(), stage).to_dict()
+                    print(f"Loaded {report_file}: status {reports[report_file]['status']}")
                 else:
                     print(f"{report_file} not found")
-                    reports[report_file] = {"status": "missing", "issues": [f"{report_file} not found"], "mitigations": ["Check previous job outputs"]}
+                    missing = Report.failed(stage, f"{report_file} not found", "Check previous job outputs")
+                    missing.status = "missing"
+                    reports[report_file] = missing.to_dict()
             except Exception as e:
                 print(f"Failed to load {report_file}: {str(e)}")
-                reports[report_file] = {"status": "error", "issues": [f"Failed to load {report_file}: {str(e)}"], "mitigations": ["Verify file format"]}
-            summary["reports"] = reports
+                broken = Report.failed(stage, f"Failed to load {report_file}: {str(e)}", "Verify file format")
+                broken.status = "error"
+                reports[report_file] = broken.to_dict()
+        report.details["reports"] = reports
 
         # Write index.html
         try:
@@ -288,8 +369,7 @@ def analyze_logs(_):
             print("Wrote index.html successfully")
         except Exception as e:
             print(f"Failed to write index.html: {str(e)}")
-            summary["issues"].append(f"Failed to write index.html: {str(e)}")
-            summary["mitigations"].append("Check disk space and permissions")
+            report.add_issue(f"Failed to write index.html: {str(e)}", "Check disk space and permissions")
 
         # Write log_analysis_report.html
         try:
@@ -299,15 +379,13 @@ def analyze_logs(_):
             print("Wrote log_analysis_report.html successfully")
         except Exception as e:
             print(f"Failed to write log_analysis_report.html: {str(e)}")
-            summary["issues"].append(f"Failed to write log_analysis_report.html: {str(e)}")
-            summary["mitigations"].append("Check disk space and permissions")
+            report.add_issue(f"Failed to write log_analysis_report.html: {str(e)}", "Check disk space and permissions")
 
-        return(partition_summary)
+        report.spans = spans("analyze")
+        return report.to_json()
     except Exception as e:
         print(f"Log analysis error: {str(e)}")
-        summary["status"] = "failed"
-        summary["issues"].append(f"Log analysis failed: {str(e)}")
-        summary["mitigations"].append("Check logs and dependencies")
+        report.fail(f"Log analysis failed: {str(e)}", "Check logs and dependencies")
         report_html = f"""
 <html>
 <head>
@@ -336,7 +414,7 @@ def analyze_logs(_):
             print("Wrote index.html for error")
         except Exception as e:
             print(f"Failed to write index.html: {str(e)}")
-        return json.dumps(summary)
+        return report.to_json()
 
 # Register functions
 try:
@@ -366,7 +444,7 @@ if __name__ == "__main__":
     try:
         print("Initiating chat to analyze logs...")
         user_proxy = autogen.UserProxyAgent(name="UserProxy")
-        result = analyze_logs(user_proxy)
+        result = run_profiled("analyze", analyze_logs, user_proxy)
         print(f"analyze_logs result: {result}")
         autogen.initiate_chats([{
             "sender": user_proxy,
@@ -377,7 +455,6 @@ if __name__ == "__main__":
         print("Chat initiated successfully")
     except Exception as e:
         print(f"Chat initiation failed: {str(e)}")
-        summary = {"status": "failed", "issues": [f"Chat initiation failed: {str(e)}"], "mitigations": ["Check autogen and dependencies"]}
         try:
             with open("log_analysis_report.html", "w") as f:
                 f.write(f"""
@@ -0,0 +1,190 @@
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+
+# Canned responses for the CLI stubs; anything not listed exits 0 with no output
+STUB_COMMANDS = {
+    "docker": """case "$1 $2" in
+  "image inspect") echo "sha256:0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef" ;;
+  "run -d") echo "stubcontainer0001" ;;
+esac""",
+    "kind": """case "$1 $2" in
+  "get clusters") echo "demo-cluster" ;;
+esac""",
+    "kubectl": """case "$*" in
+  *"containers[?"*) echo "ghcr.io/${GITHUB_ACTOR:-ravitejareddy123}/myimage:sha-0123456789ab" ;;
+  get*) echo '{"spec": {"ports": [{"port": 80, "nodePort": 30080}]}}' ;;
+  rollout*) echo 'deployment "microservice" successfully rolled out' ;;
+esac""",
+}
+
+# Put shell stubs for docker, kind and kubectl first on PATH so agents run offline
+def install_cli_stubs(directory):
+    bin_dir = os.path.join(directory, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    for name, body in STUB_COMMANDS.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(f"#!/bin/sh\n{body}\nexit 0\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    return bin_dir
+
+# GPT-2's reversible byte -> printable unicode mapping, used as the tiny tokenizer's vocabulary
+def bytes_to_unicode():
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("\xa1"), ord("\xac") + 1)) + list(range(ord("\xae"), ord("\xff") + 1))
+    codes = printable[:]
+    extra = 0
+    for b in range(256):
+        if b not in printable:
+            printable.append(b)
+            codes.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, (chr(c) for c in codes)))
+
+# Byte-level GPT-2 tokenizer and a two-layer model, small enough to build and run offline
+def build_tiny_model(directory, n_layer=2, n_embd=64, n_head=2):
+    from transformers import GPT2Config, GPT2LMHeadModel, GPT2Tokenizer
+
+    model_dir = os.path.join(directory, "tiny-gpt2")
+    os.makedirs(model_dir, exist_ok=True)
+    vocab = {token: index for index, token in enumerate(bytes_to_unicode().values())}
+    vocab["<|endoftext|>"] = len(vocab)
+    with open(os.path.join(model_dir, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(model_dir, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+    tokenizer = GPT2Tokenizer(os.path.join(model_dir, "vocab.json"), os.path.join(model_dir, "merges.txt"))
+    tokenizer.save_pretrained(model_dir)
+    config = GPT2Config(
+        vocab_size=len(vocab), n_positions=1024, n_embd=n_embd, n_layer=n_layer, n_head=n_head,
+        bos_token_id=vocab["<|endoftext|>"], eos_token_id=vocab["<|endoftext|>"],
+    )
+    GPT2LMHeadModel(config).save_pretrained(model_dir)
+    return model_dir
+
+class _DockerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        daemon = self.server.daemon
+        path = urllib.parse.urlparse(self.path).path
+        daemon.requests += 1
+        if path == "/containers/json":
+            self._reply(daemon.containers)
+        elif path == "/images/json":
+            self._reply(daemon.images)
+        elif path == "/info":
+            self._reply({"DockerRootDir": daemon.root_dir})
+        elif path.startswith("/images/") and path.endswith("/json"):
+            name = urllib.parse.unquote(path[len("/images/"):-len("/json")])
+            for image in daemon.images:
+                if name in (image.get("RepoTags") or []) or name == image["Id"]:
+                    return self._reply(image)
+            self._reply({"message": f"No such image: {name}"}, 404)
+        else:
+            self._reply({"message": "not found"}, 404)
+
+    def do_POST(self):
+        self.server.daemon.requests += 1
+        self._reply({"SpaceReclaimed": 0})
+
+    def do_DELETE(self):
+        self.server.daemon.requests += 1
+        self._reply([{"Deleted": self.path}])
+
+    def log_message(self, format, *args):
+        pass
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        self.connections = set()
+        super().__init__(*args)
+
+    def get_request(self):
+        request, _ = super().get_request()
+        self.connections.add(request)
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("stub", 0)
+
+    def shutdown_request(self, request):
+        self.connections.discard(request)
+        super().shutdown_request(request)
+
+class StubDockerDaemon:
+    """Docker Engine API stand-in served on a unix socket for discovery and cleanup code."""
+
+    def __init__(self, directory, containers=None, images=None):
+        self.socket_path = os.path.join(directory, "docker.sock")
+        self.root_dir = directory
+        self.requests = 0
+        self.containers = containers if containers is not None else [{
+            "Id": "stubcontainer0001" * 4,
+            "ImageID": "sha256:" + "a" * 64,
+            "NetworkSettings": {"Networks": {"bridge": {"IPAddress": "127.0.0.1"}}},
+            "Ports": [{"PrivatePort": 5000, "PublicPort": 5000}],
+        }]
+        self.images = images if images is not None else [
+            {"Id": "sha256:" + "a" * 64, "RepoTags": ["ghcr.io/ravitejareddy123/myimage:latest"], "Size": 150_000_000},
+            {"Id": "sha256:" + "b" * 64, "RepoTags": ["python:3.10-slim"], "Size": 50_000_000},
+        ]
+        self._server = None
+
+    def __enter__(self):
+        self._server = _UnixServer(self.socket_path, _DockerHandler)
+        self._server.daemon = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    # Close every open client connection, as the daemon does with idle keep-alive connections
+    def drop_connections(self):
+        for request in list(self._server.connections):
+            request.shutdown(socket.SHUT_RDWR)
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        os.remove(self.socket_path)
+
+# Werkzeug-style access log dominated by probe hits, with a few app errors mixed in
+def write_access_log(path, lines, seed=0):
+    import random
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(lines):
+            ip = f"10.244.0.{rng.randint(1, 250)}"
+            stamp = f"[19/Oct/2025 10:{i // 60 % 60:02d}:{i % 60:02d}]"
+            roll = rng.random()
+            if roll < 0.8:
+                f.write(f'{ip} - - {stamp} "GET /health HTTP/1.1" 200 -\n')
+            elif roll < 0.95:
+                f.write(f'{ip} - - {stamp} "GET / HTTP/1.1" 200 -\n')
+            elif roll < 0.98:
+                f.write(f"2025-10-19 10:00:{i % 60:02d},{rng.randint(0, 999):03d} ERROR worker {i % 7} failed after {rng.random() * 100:.1f}ms: connection reset by peer\n")
+            else:
+                f.write(f'{ip} - - {stamp} "GET /items/{i} HTTP/1.1" 404 -\n')
+    return path
+
+# Temporary working directory with CLI stubs and the tiny model wired in through the environment
+def offline_environment(with_model=True):
+    directory = tempfile.mkdtemp(prefix="agent-bench-")
+    install_cli_stubs(directory)
+    if with_model:
+        os.environ["GPT2_MODEL"] = build_tiny_model(directory)
+    return directory
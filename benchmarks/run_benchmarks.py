@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import offline_environment, StubDockerDaemon, write_access_log
+
+DEFAULT_ROWS = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+
+# Time repeated calls and summarise them in milliseconds
+def measure(func, repeat):
+    from load_test import latency_stats
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return latency_stats(samples)
+
+def bench_llm_create(repeat):
+    from llm_client import CustomLLMClient, load_model
+    started = time.perf_counter()
+    load_model()
+    load_ms = (time.perf_counter() - started) * 1000
+    client = CustomLLMClient(stage="bench")
+    params = {"prompt": "Build failed: docker push denied. Suggest a mitigation."}
+    client.create(params)
+    return {"model_load_ms": round(load_ms, 3), "create_ms": measure(lambda: client.create(params), repeat)}
+
+# analyze_s comes from the "log analysis" span, so it excludes the mock-log generation inside analyze_logs
+def bench_log_analysis(rows_list):
+    from autogen_log_analysis import generate_mock_logs, analyze_logs
+    from tracing import spans
+    results = []
+    for rows in rows_list:
+        started = time.perf_counter()
+        generate_mock_logs(rows, seed=0)
+        generate_s = time.perf_counter() - started
+        started = time.perf_counter()
+        analyze_logs(None, reports={}, log_rows=rows, workers=1)
+        end_to_end_s = time.perf_counter() - started
+        analyze_s = [s for s in spans("analyze") if s["name"] == "log analysis"][-1]["wall_ms"] / 1000
+        results.append({
+            "rows": rows,
+            "generate_s": round(generate_s, 4),
+            "generate_rows_per_s": round(rows / generate_s),
+            "analyze_s": round(analyze_s, 4),
+            "analyze_rows_per_s": round(rows / analyze_s) if analyze_s else None,
+            "end_to_end_s": round(end_to_end_s, 4),
+        })
+        print(f"log analysis {rows} rows: generate {generate_s:.3f}s, analyze {analyze_s:.3f}s, "
+              f"end to end {end_to_end_s:.3f}s")
+    return results
+
+# Build and deploy stages end to end against the docker/kind/kubectl stubs: measures the
+# agents' own orchestration and shell-out overhead, not docker or the cluster
+def bench_agent_stages(directory, repeat):
+    import shutil
+    for name in ("Dockerfile", "deployment.yaml", "kind-config.yaml"):
+        shutil.copy(os.path.join(REPO_ROOT, name), directory)
+    from build_agent import build_and_push
+    from deploy_agent import deploy
+    from reports import Report
+    results = {}
+    for stage, run in (("build", build_and_push), ("deploy", deploy)):
+        statuses = set()
+
+        def run_once():
+            report = Report(stage)
+            run(report)
+            statuses.add(report.status)
+
+        results[stage] = {"stage_ms": measure(run_once, repeat), "statuses": sorted(statuses)}
+        if statuses != {"success"}:
+            raise RuntimeError(f"{stage} stage against the CLI stubs ended with {sorted(statuses)}")
+        print(f"{stage} stage against stubs: p50 {results[stage]['stage_ms']['p50']}ms")
+    return results
+
+def bench_log_templates(directory, lines):
+    from log_templates import mine_files
+    path = write_access_log(os.path.join(directory, "access.log"), lines)
+    started = time.perf_counter()
+    miner = mine_files([path])
+    elapsed = time.perf_counter() - started
+    summary = miner.summary(5)
+    print(f"template mining {lines} lines: {elapsed:.3f}s, {summary['templates']} templates")
+    return {"lines": lines, "mine_s": round(elapsed, 4), "lines_per_s": round(lines / elapsed),
+            "noise_dropped": summary["noise_dropped"], "templates": summary["templates"],
+            "compression": summary["compression"]}
+
+# Sharded analysis at 1, 2, 4, ... workers up to the CPU count, on the vectorized mock-log generator
+def bench_sharded_scaling(rows, repeat):
+    import pandas as pd
+    from log_shards import analyze_sharded
+    cpus = os.cpu_count() or 1
+    counts = sorted({2 ** i for i in range(cpus.bit_length()) if 2 ** i <= cpus} | {cpus})
+    start_time = pd.Timestamp("2025-01-01")
+    results = []
+    for workers in counts:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            stats = analyze_sharded(rows, start_time, workers, seed=0)
+            samples.append(time.perf_counter() - started)
+        assert stats.requests == rows
+        best = min(samples)
+        results.append({"workers": workers, "seconds": round(best, 4), "rows_per_s": round(rows / best)})
+        print(f"sharded analysis {rows} rows on {workers} worker(s): {best:.3f}s")
+    for result in results:
+        result["speedup"] = round(results[0]["seconds"] / result["seconds"], 2)
+        result["efficiency"] = round(result["speedup"] / result["workers"], 2)
+    return {"rows": rows, "cpus": cpus, "scaling": results}
+
+def bench_app_throughput(duration, concurrency):
+    from werkzeug.serving import make_server
+    from app import app
+    from load_test import run_load_test
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        result = run_load_test(f"http://127.0.0.1:{server.server_port}", concurrency=concurrency, duration=duration)
+    finally:
+        server.shutdown()
+    return {"concurrency": concurrency, "overall": result["overall"],
+            "endpoints": {e: {"throughput_rps": s["throughput_rps"], "latency_ms": s["latency_ms"]}
+                          for e, s in result["endpoints"].items()}}
+
+# Context lookup plus prompt assembly for one agent, against an index of past reports
+def bench_train_context(directory, reports, repeat):
+    import retrieval_index
+    import train_agents
+    from reports import Report
+    db_path = os.path.join(directory, "train_index.db")
+    for i in range(reports):
+        report = Report.failed(("build", "test", "deploy")[i % 3], f"rollout stuck on ImagePullBackOff on runner {i % 97}",
+                               f"mitigation {i % 13}")
+        report.created_at = f"2025-01-01T00:00:{i:09d}"
+        retrieval_index.index_report(report, db_path)
+    return {"reports": reports,
+            "context_ms": measure(lambda: train_agents.build_prompt(
+                "deploy", train_agents.retrieve_context("deploy", db_path)), repeat)}
+
+def bench_retrieval(directory, reports, repeat):
+    import retrieval_index
+    from reports import Report
+    db_path = os.path.join(directory, "report_index.db")
+    errors = ["docker push denied", "kind create cluster timed out", "rollout stuck on ImagePullBackOff",
+              "health check failed: 503", "load test p95 above threshold"]
+    started = time.perf_counter()
+    for i in range(reports):
+        report = Report.failed(("build", "test", "deploy")[i % 3], f"{errors[i % len(errors)]} on runner {i % 97}",
+                               f"mitigation {i % 13}")
+        report.created_at = f"2025-01-01T00:00:{i:09d}"
+        retrieval_index.index_report(report, db_path)
+    index_s = time.perf_counter() - started
+    query = "kind create cluster timed out waiting for nodes"
+    return {"reports": reports, "index_reports_per_s": round(reports / index_s),
+            "search_ms": measure(lambda: retrieval_index.search(query, 3, "deploy", db_path), repeat)}
+
+def bench_discovery(directory, repeat):
+    from docker_discovery import ContainerDiscovery, DockerClient
+    image = "ghcr.io/ravitejareddy123/myimage:latest"
+    with StubDockerDaemon(directory) as daemon:
+        client = DockerClient(daemon.socket_path)
+        uncached = measure(lambda: ContainerDiscovery(client).container_url(image), repeat)
+        discovery = ContainerDiscovery(client)
+        cached = measure(lambda: discovery.container_url(image), repeat)
+        client.close_connection()
+        return {"uncached_ms": uncached, "cached_ms": cached, "daemon_requests": daemon.requests}
+
+# Each profile runs in its own process because torch inter-op threads can only be set once
+def bench_exec_profiles(repeat):
+    from execution_profile import PROFILES
+    results = []
+    variants = [(name, False) for name in PROFILES] + [("auto", True)]
+    for name, pin in variants:
+        args = [sys.executable, os.path.join(REPO_ROOT, "execution_profile.py"), "--profile", name,
+                "--bench", "--repeat", str(repeat)] + (["--pin"] if pin else [])
+        result = subprocess.run(args, capture_output=True, text=True)
+        if result.returncode != 0:
+            results.append({"profile": name, "pinned": pin, "error": result.stderr.strip()[-500:]})
+            continue
+        measured = json.loads(result.stdout.strip().splitlines()[-1])
+        measured["pinned"] = pin
+        results.append(measured)
+        print(f"exec profile {name}{' (pinned)' if pin else ''}: {measured['tokens_per_s']} tokens/s "
+              f"with {measured['intra_op_threads']} intra-op threads")
+    return results
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=REPO_ROOT)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the pipeline agents and microservice")
+    parser.add_argument("--only", action="append", help="run only the named benchmark (repeatable)")
+    parser.add_argument("--max-rows", type=int, default=10 ** 7, help="largest mock-log size to analyse")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=5.0, help="app load-test duration in seconds")
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmark_results.json"))
+    args = parser.parse_args()
+
+    model_benchmarks = {"llm_create", "train_context", "agent_stages", "exec_profiles"}
+    directory = offline_environment(with_model=args.only is None or bool(model_benchmarks & set(args.only)))
+    # Agents write their reports and HTML into the working directory
+    os.chdir(directory)
+    benchmarks = {
+        "llm_create": lambda: bench_llm_create(max(3, args.repeat // 4)),
+        "log_analysis": lambda: bench_log_analysis([r for r in DEFAULT_ROWS if r <= args.max_rows]),
+        "agent_stages": lambda: bench_agent_stages(directory, max(3, args.repeat // 4)),
+        "app_throughput": lambda: bench_app_throughput(args.duration, 8),
+        "train_context": lambda: bench_train_context(directory, 5_000, args.repeat),
+        "discovery": lambda: bench_discovery(directory, args.repeat),
+        "retrieval": lambda: bench_retrieval(directory, 5_000, args.repeat),
+        "log_templates": lambda: bench_log_templates(directory, 500_000),
+        "sharded_scaling": lambda: bench_sharded_scaling(min(args.max_rows, 10 ** 7), 3),
+        "exec_profiles": lambda: bench_exec_profiles(max(3, args.repeat // 4)),
+    }
+    results = {}
+    for name, bench in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        print(f"Running benchmark {name}...")
+        try:
+            results[name] = bench()
+        except Exception as e:
+            print(f"Benchmark {name} failed: {str(e)}")
+            results[name] = {"error": str(e)}
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    # One line per run so results can be compared over time
+    with open(os.path.join(os.path.dirname(args.output), "benchmark_history.jsonl"), "a") as f:
+        f.write(json.dumps(report) + "\n")
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
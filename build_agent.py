@@ -1,9 +1,10 @@
 import autogen
-import subprocess
-import json
 import os
-from datetime import datetime
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
+from llm_client import CustomLLMClient, init_backend
+from tracing import span
+from profiling import run_profiled
+from command_runner import run_command
+from reports import Report, write_report, encode_history
 import sqlite3
 import sys
 
@@ -14,54 +15,14 @@ print(f"Running build_agent.py from: {os.path.abspath(__file__)}")
 # Initialize GPT-2
 try:
     print("Initializing GPT-2 tokenizer and model...")
-    tokenizer = GPT2Tokenizer.from_pretrained("gpt2", force_download=True, clean_up_tokenization_spaces=True)
-    model = GPT2LMHeadModel.from_pretrained("gpt2", force_download=True)
+    init_backend()
     print("GPT-2 initialized successfully")
 except Exception as e:
     print(f"Failed to initialize GPT-2: {str(e)}")
-    summary = {
-        "status": "failed",
-        "image": "",
-        "issues": [f"GPT-2 initialization failed: {str(e)}"],
-        "mitigations": ["Check transformers and torch dependencies, ensure network access"]
-    }
-    try:
-        with open("build_report.json", "w") as f:
-            json.dump(summary, f, indent=2)
-    except Exception as e:
-        print(f"Failed to write build_report.json: {str(e)}")
+    write_report(Report.failed("build", f"GPT-2 initialization failed: {str(e)}",
+                               "Check transformers and torch dependencies, ensure network access", image=""))
     exit(1)
 
-# Custom LLM client
-class CustomLLMClient:
-    def create(self, params):
-        try:
-            print("Processing LLM request...")
-            prompt = params.get("prompt", "")
-            inputs = tokenizer(prompt, return_tensors="pt", max_length=512, truncation=True)
-            attention_mask = inputs["attention_mask"]
-            outputs = model.generate(
-                inputs["input_ids"],
-                attention_mask=attention_mask,
-                max_new_tokens=150,
-                do_sample=True,
-                pad_token_id=tokenizer.eos_token_id
-            )
-            response_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-            print(f"LLM response: {response_text}")
-            try:
-                if "```json" in response_text:
-                    json_part = response_text.split("```json")[-1].split("```")[0]
-                    response_json = json.loads(json_part)
-                else:
-                    response_json = {"message": response_text}
-            except Exception:
-                response_json = {"message": response_text}
-            return {"choices": [{"message": {"content": json.dumps(response_json)}}]}
-        except Exception as e:
-            print(f"LLM client error: {str(e)}")
-            return {"choices": [{"message": {"content": json.dumps({"error": str(e)})}}]}
-
 # Define build agent
 try:
     print("Initializing BuildAgent...")
@@ -70,115 +31,73 @@ try:
         llm_config=False,
         system_message="You are a Build Agent. Execute Docker build and push commands, then return a JSON summary of the build status."
     )
-    build_agent.llm_client = CustomLLMClient()
+    build_agent.llm_client = CustomLLMClient(stage="build")
     print("BuildAgent initialized successfully")
 except Exception as e:
     print(f"Failed to initialize BuildAgent: {str(e)}")
-    summary = {
-        "status": "failed",
-        "image": "",
-        "issues": [f"BuildAgent initialization failed: {str(e)}"],
-        "mitigations": ["Check autogen and flaml dependencies"]
-    }
-    try:
-        with open("build_report.json", "w") as f:
-            json.dump(summary, f, indent=2)
-    except Exception as e:
-        print(f"Failed to write build_report.json: {str(e)}")
+    write_report(Report.failed("build", f"BuildAgent initialization failed: {str(e)}",
+                               "Check autogen and flaml dependencies", image=""))
     exit(1)
 
 # Store build summary
-def store_build_summary(summary):
+def store_build_summary(report):
     try:
         conn = sqlite3.connect('build_data.db')
         c = conn.cursor()
         c.execute('''CREATE TABLE IF NOT EXISTS build_data
                      (timestamp TEXT, summary TEXT)''')
         c.execute('INSERT INTO build_data VALUES (?, ?)',
-                  (datetime.now().isoformat(), json.dumps(summary)))
+                  (report.created_at, encode_history(report)))
         conn.commit()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         conn.close()
 
-# Build and push Docker image
-def build_and_push_docker(_):
-    summary = {"status": "unknown", "image": "", "issues": [], "mitigations": []}
-    try:
-        github_actor = os.getenv("GITHUB_ACTOR", "ravitejareddy123")
-        image_name = f"ghcr.io/{github_actor}/myimage:latest"
-        print(f"Building image: {image_name}")
-        
-        # Verify Dockerfile exists
-        if not os.path.exists("Dockerfile"):
-            summary["status"] = "failed"
-            summary["issues"].append("Dockerfile not found")
-            summary["mitigations"].append("Ensure Dockerfile is in the repository root")
-            store_build_summary(summary)
-            try:
-                with open("build_report.json", "w") as f:
-                    json.dump(summary, f, indent=2)
-                print("Wrote build_report.json for Dockerfile error")
-            except Exception as e:
-                print(f"Failed to write build_report.json: {str(e)}")
-            return json.dumps(summary, indent=2)
+def build_and_push(report):
+    github_actor = os.getenv("GITHUB_ACTOR", "ravitejareddy123")
+    image_name = f"ghcr.io/{github_actor}/myimage:latest"
+    print(f"Building image: {image_name}")
 
-        print("Running docker build...")
-        result = subprocess.run(
-            ["docker", "build", "-t", image_name, "."],
-            capture_output=True, text=True
+    # Verify Dockerfile exists
+    if not os.path.exists("Dockerfile"):
+        report.fail("Dockerfile not found", "Ensure Dockerfile is in the repository root")
+        return
+
+    print("Running docker build...")
+    with span("docker build", stage="build", image=image_name):
+        result = run_command(
+            ["docker", "build", "-t", image_name, "."], stream=True
         )
-        print(f"Docker build stdout: {result.stdout}")
-        print(f"Docker build stderr: {result.stderr}")
-        if result.returncode != 0:
-            summary["status"] = "failed"
-            summary["issues"].append(f"Docker build failed: {result.stderr}")
-            summary["mitigations"].append("Check Dockerfile, build context, and dependencies")
-            store_build_summary(summary)
-            try:
-                with open("build_report.json", "w") as f:
-                    json.dump(summary, f, indent=2)
-                print("Wrote build_report.json for build failure")
-            except Exception as e:
-                print(f"Failed to write build_report.json: {str(e)}")
-            return json.dumps(summary, indent=2)
+    report.timings["docker_build_s"] = round(result.duration_s, 3)
+    if result.returncode != 0:
+        report.fail(f"Docker build failed: {result.stderr}", "Check Dockerfile, build context, and dependencies")
+        return
 
-        print(f"Pushing image: {image_name}")
-        result = subprocess.run(
-            ["docker", "push", image_name],
-            capture_output=True, text=True
+    print(f"Pushing image: {image_name}")
+    with span("docker push", stage="build", image=image_name):
+        result = run_command(
+            ["docker", "push", image_name], stream=True
         )
-        print(f"Docker push stdout: {result.stdout}")
-        print(f"Docker push stderr: {result.stderr}")
-        if result.returncode == 0:
-            summary["status"] = "success"
-            summary["image"] = image_name
-        else:
-            summary["status"] = "failed"
-            summary["issues"].append(f"Docker push failed: {result.stderr}")
-            summary["mitigations"].append("Verify GHCR credentials, network, and repository access")
-        store_build_summary(summary)
-        try:
-            with open("build_report.json", "w") as f:
-                json.dump(summary, f, indent=2)
-            print("Wrote build_report.json for push result")
-        except Exception as e:
-            print(f"Failed to write build_report.json: {str(e)}")
-        return json.dumps(summary, indent=2)
+    report.timings["docker_push_s"] = round(result.duration_s, 3)
+    if result.returncode == 0:
+        report.status = "success"
+        report.details["image"] = image_name
+    else:
+        report.fail(f"Docker push failed: {result.stderr}", "Verify GHCR credentials, network, and repository access")
+
+# Build and push Docker image; the report is stored and written once, whatever the outcome
+def build_and_push_docker(_):
+    report = Report("build", details={"image": ""})
+    try:
+        build_and_push(report)
     except Exception as e:
-        summary["status"] = "failed"
-        summary["issues"].append(f"Unexpected error in build_and_push_docker: {str(e)}")
-        summary["mitigations"].append("Check Docker installation, permissions, and environment")
         print(f"Unexpected error in build_and_push_docker: {str(e)}")
-        store_build_summary(summary)
-        try:
-            with open("build_report.json", "w") as f:
-                json.dump(summary, f, indent=2)
-            print("Wrote build_report.json for unexpected error")
-        except Exception as e:
-            print(f"Failed to write build_report.json: {str(e)}")
-        return json.dumps(summary, indent=2)
+        report.fail(f"Unexpected error in build_and_push_docker: {str(e)}",
+                    "Check Docker installation, permissions, and environment")
+    write_report(report)
+    store_build_summary(report)
+    return report.to_json(indent=2)
 
 # Register functions
 try:
@@ -187,26 +106,16 @@ try:
     print("Function registered successfully")
 except Exception as e:
     print(f"Failed to register function: {str(e)}")
-    summary = {
-        "status": "failed",
-        "image": "",
-        "issues": [f"Function registration failed: {str(e)}"],
-        "mitigations": ["Check autogen version"]
-    }
-    try:
-        with open("build_report.json", "w") as f:
-            json.dump(summary, f, indent=2)
-        print("Wrote build_report.json for function registration error")
-    except Exception as e:
-        print(f"Failed to write build_report.json: {str(e)}")
+    write_report(Report.failed("build", f"Function registration failed: {str(e)}", "Check autogen version", image=""))
     exit(1)
 
 if __name__ == "__main__":
+    result = None
     try:
         print("Initiating chat to build and push Docker image...")
         # Ensure the function is called even if chat fails
         user_proxy = autogen.UserProxyAgent(name="UserProxy")
-        result = build_and_push_docker(user_proxy)
+        result = run_profiled("build", build_and_push_docker, user_proxy)
         print(f"build_and_push_docker result: {result}")
         autogen.initiate_chats([{
             "sender": user_proxy,
@@ -217,17 +126,10 @@ if __name__ == "__main__":
         print("Chat initiated successfully")
     except Exception as e:
         print(f"Chat initiation failed: {str(e)}")
-        summary = {
-            "status": "failed",
-            "image": "",
-            "issues": [f"Chat initiation failed: {str(e)}"],
-            "mitigations": ["Check autogen and dependencies"]
-        }
-        store_build_summary(summary)
-        try:
-            with open("build_report.json", "w") as f:
-                json.dump(summary, f, indent=2)
-            print("Wrote build_report.json for chat initiation error")
-        except Exception as e:
-            print(f"Failed to write build_report.json: {str(e)}")
+        # Keep the build outcome if the stage already ran; its summary is already stored then
+        report = Report.from_json(result, "build") if result else Report("build", details={"image": ""})
+        report.fail(f"Chat initiation failed: {str(e)}", "Check autogen and dependencies")
+        if not result:
+            store_build_summary(report)
+        write_report(report)
         exit(1)
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+
+DEFAULT_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", "900"))
+MAX_CONCURRENCY = int(os.getenv("COMMAND_CONCURRENCY", "4"))
+# docker build progress can emit very long lines
+STREAM_LINE_LIMIT = 1024 * 1024
+# Output still buffered after the command exits is read for at most this long; a background child
+# that inherited the pipes can keep them open indefinitely
+PIPE_DRAIN_GRACE = 2.0
+
+@dataclass
+class CommandResult:
+    args: list
+    returncode: int
+    stdout: str
+    stderr: str
+    duration_s: float
+    timed_out: bool = False
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def summary(self):
+        return {"command": " ".join(self.args), "returncode": self.returncode,
+                "duration_s": round(self.duration_s, 3), "timed_out": self.timed_out}
+
+async def _read_stream(stream, lines, label, stream_output):
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        text = line.decode(errors="replace")
+        lines.append(text)
+        if stream_output:
+            print(f"[{label}] {text.rstrip()}")
+
+# Run one command, streaming its output as it arrives; kill it on timeout or cancellation
+# Process.wait() also waits for the pipes to close, so poll the exit status with a short backoff
+async def _exited(process):
+    delay = 0.001
+    while process.returncode is None:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.05)
+    return process.returncode
+
+async def run_command_async(args, timeout=DEFAULT_TIMEOUT, input=None, stream=False, label=None):
+    label = label or " ".join(args[:2])
+    started = time.perf_counter()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LINE_LIMIT,
+        )
+    except OSError as e:
+        return CommandResult(list(args), 127, "", str(e), time.perf_counter() - started)
+    stdout, stderr = [], []
+
+    async def communicate():
+        if input is not None:
+            # A command may exit without reading its input; its exit status still tells the story
+            try:
+                process.stdin.write(input.encode())
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            process.stdin.close()
+        await _exited(process)
+
+    readers = asyncio.gather(
+        _read_stream(process.stdout, stdout, label, stream),
+        _read_stream(process.stderr, stderr, label, stream),
+    )
+    timed_out = False
+    try:
+        # Wait for the process itself, not for EOF on its pipes
+        await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        if process.returncode is None:
+            timed_out = True
+            process.kill()
+            await _exited(process)
+            stderr.append(f"Command timed out after {timeout}s\n")
+    except asyncio.CancelledError:
+        readers.cancel()
+        process.kill()
+        await _exited(process)
+        raise
+    try:
+        await asyncio.wait_for(readers, PIPE_DRAIN_GRACE)
+    except asyncio.TimeoutError:
+        # wait_for cancelled the readers; close the pipes so nothing is left on the loop
+        for pipe in (process.stdout, process.stderr):
+            pipe._transport.close()
+    returncode = process.returncode
+    return CommandResult(list(args), returncode, "".join(stdout), "".join(stderr),
+                         time.perf_counter() - started, timed_out)
+
+# Run several commands concurrently, at most max_concurrency at a time, results in input order.
+# Each command is a list of args or a dict of run_command_async keyword arguments.
+async def run_commands_async(commands, max_concurrency=MAX_CONCURRENCY):
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def limited(command):
+        kwargs = command if isinstance(command, dict) else {"args": command}
+        async with semaphore:
+            return await run_command_async(**kwargs)
+
+    return await asyncio.gather(*(limited(command) for command in commands))
+
+def run_command(args, timeout=DEFAULT_TIMEOUT, input=None, stream=False, label=None):
+    return asyncio.run(run_command_async(args, timeout, input, stream, label))
+
+def run_commands(commands, max_concurrency=MAX_CONCURRENCY):
+    return asyncio.run(run_commands_async(commands, max_concurrency))
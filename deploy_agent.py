@@ -1,10 +1,21 @@
 import autogen
-import subprocess
 import json
 import os
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
+from llm_client import CustomLLMClient, init_backend
+from tracing import span
+from profiling import run_profiled
 import sys
 import time
+import random
+import re
+import hashlib
+import math
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from load_test import load_test_config, run_load_test
+from docker_discovery import ContainerDiscovery
+from command_runner import run_command, run_commands
+from reports import Report, write_report
 
 # Debug: Print Python version and file path
 print(f"Python version: {sys.version}")
@@ -15,7 +26,7 @@ try:
     print("Checking kind-config.yaml...")
     with open("kind-config.yaml", "r") as f:
         print(f"kind-config.yaml contents:\n{f.read()}")
-    result = subprocess.run(["file", "kind-config.yaml"], capture_output=True, text=True)
+    result = run_command(["file", "kind-config.yaml"])
     print(f"kind-config.yaml file type: {result.stdout}")
 except Exception as e:
     print(f"Error checking kind-config.yaml: {str(e)}")
@@ -23,52 +34,14 @@ except Exception as e:
 # Initialize GPT-2
 try:
     print("Initializing GPT-2 tokenizer and model...")
-    tokenizer = GPT2Tokenizer.from_pretrained("gpt2", force_download=True, clean_up_tokenization_spaces=True)
-    model = GPT2LMHeadModel.from_pretrained("gpt2", force_download=True)
+    init_backend()
     print("GPT-2 initialized successfully")
 except Exception as e:
     print(f"Failed to initialize GPT-2: {str(e)}")
-    summary = {
-        "status": "failed",
-        "issues": [f"GPT-2 initialization failed: {str(e)}"],
-        "mitigations": ["Check transformers and torch dependencies, ensure network access"]
-    }
-    try:
-        with open("deploy_report.json", "w") as f:
-            json.dump(summary, f, indent=2)
-        print("Wrote deploy_report.json for GPT-2 initialization error")
-    except Exception as e:
-        print(f"Failed to write deploy_report.json: {str(e)}")
+    write_report(Report.failed("deploy", f"GPT-2 initialization failed: {str(e)}",
+                               "Check transformers and torch dependencies, ensure network access"))
     exit(1)
 
-# Custom LLM client
-class CustomLLMClient:
-    def create(self, params):
-        try:
-            prompt = params.get("prompt", "")
-            inputs = tokenizer(prompt, return_tensors="pt", max_length=512, truncation=True)
-            attention_mask = inputs["attention_mask"]
-            outputs = model.generate(
-                inputs["input_ids"],
-                attention_mask=attention_mask,
-                max_new_tokens=150,
-                do_sample=True,
-                pad_token_id=tokenizer.eos_token_id
-            )
-            response_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-            try:
-                if "```json" in response_text:
-                    json_part = response_text.split("```json")[-1].split("```")[0]
-                    response_json = json.loads(json_part)
-                else:
-                    response_json = {"message": response_text}
-            except Exception:
-                response_json = {"message": response_text}
-            return {"choices": [{"message": {"content": json.dumps(response_json)}}]}
-        except Exception as e:
-            print(f"LLM client error: {str(e)}")
-            return {"choices": [{"message": {"content": json.dumps({"error": str(e)})}}]}
-
 # Define deploy agent
 try:
     print("Initializing DeployAgent...")
@@ -77,102 +50,522 @@ try:
         llm_config=False,
         system_message="You are a Deploy Agent. Apply Kubernetes manifests and generate a JSON report."
     )
-    deploy_agent.llm_client = CustomLLMClient()
+    deploy_agent.llm_client = CustomLLMClient(stage="deploy")
     print("DeployAgent initialized successfully")
 except Exception as e:
     print(f"Failed to initialize DeployAgent: {str(e)}")
-    summary = {
-        "status": "failed",
-        "issues": [f"DeployAgent initialization failed: {str(e)}"],
-        "mitigations": ["Check autogen and flaml dependencies"]
-    }
-    try:
-        with open("deploy_report.json", "w") as f:
-            json.dump(summary, f, indent=2)
-        print("Wrote deploy_report.json for DeployAgent initialization error")
-    except Exception as e:
-        print(f"Failed to write deploy_report.json: {str(e)}")
+    write_report(Report.failed("deploy", f"DeployAgent initialization failed: {str(e)}",
+                               "Check autogen and flaml dependencies"))
     exit(1)
 
-# Deploy to Kubernetes
-def deploy_to_kubernetes(_):
-    summary = {"status": "unknown", "issues": [], "mitigations": []}
+CLUSTER_NAME = os.getenv("KIND_CLUSTER", "demo-cluster")
+CREATE_ATTEMPTS = 3
+NODE_READY_TIMEOUT = int(os.getenv("NODE_READY_TIMEOUT", "120"))
+ROLLOUT_TIMEOUT = int(os.getenv("ROLLOUT_TIMEOUT", "120"))
+IMAGE_NAME = os.getenv("IMAGE", f"ghcr.io/{os.getenv('GITHUB_ACTOR', 'ravitejareddy123')}/myimage:latest")
+
+# Exponential backoff with full jitter: sleep a random time up to base * 2^attempt, capped
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# Block until the selected resources report Ready, or the timeout expires
+def wait_for(resource, selector, timeout, condition="Ready"):
+    args = ["kubectl", "wait", f"--for=condition={condition}", resource, f"--timeout={timeout}s"]
+    if selector is not None:
+        args += ["--all"] if selector == "all" else ["-l", selector]
+    result = run_command(args)
+    print(f"kubectl wait {resource} stdout: {result.stdout}")
+    if result.returncode != 0:
+        print(f"kubectl wait {resource} stderr: {result.stderr}")
+    return result.returncode == 0, result.stderr.strip()
+
+# Follow the rollout until every new replica is available
+def wait_for_rollout(deployment, timeout):
+    result = run_command(
+        ["kubectl", "rollout", "status", f"deployment/{deployment}", f"--timeout={timeout}s"]
+    )
+    print(f"kubectl rollout status stdout: {result.stdout}")
+    if result.returncode != 0:
+        print(f"kubectl rollout status stderr: {result.stderr}")
+    return result.returncode == 0, result.stderr.strip()
+
+MANIFEST_HASH_ANNOTATION = "ci.pipeline/manifest-hash"
+# Kinds other documents may depend on; they are applied in an earlier wave
+FOUNDATION_KINDS = {"Namespace", "CustomResourceDefinition", "ServiceAccount", "ConfigMap", "Secret", "PersistentVolumeClaim"}
+
+def live_manifest_hash(deployment):
+    key = MANIFEST_HASH_ANNOTATION.replace(".", "\\.")
+    result = run_command(
+        ["kubectl", "get", f"deployment/{deployment}", "-o", f"jsonpath={{.metadata.annotations.{key}}}"]
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+# Set the image of the deployment's own container in the parsed manifest. Returns the re-serialized
+# manifest and whether a container was found, so a manifest that names another image still gets pinned.
+def pin_deployment_image(manifest, deployment, image):
+    documents = [d for d in yaml.safe_load_all(manifest) if d]
+    pinned = False
+    for document in documents:
+        if document.get("kind") != "Deployment" or document.get("metadata", {}).get("name") != deployment:
+            continue
+        for container in document.get("spec", {}).get("template", {}).get("spec", {}).get("containers", []):
+            if container.get("name") == deployment:
+                container["image"] = image
+                pinned = True
+    return yaml.safe_dump_all(documents, sort_keys=False), pinned
+
+def hpa_exists(name):
+    result = run_command(["kubectl", "get", "hpa", name, "--ignore-not-found", "-o", "jsonpath={.metadata.name}"])
+    return result.returncode == 0 and result.stdout.strip() == name
+
+def live_image(deployment):
+    result = run_command(
+        ["kubectl", "get", f"deployment/{deployment}", "-o",
+         f"jsonpath={{.spec.template.spec.containers[?(@.name==\"{deployment}\")].image}}"]
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+# Split a multi-document manifest and stamp the manifest hash onto every Deployment, merged into
+# any annotations it already has. With an HPA in charge, spec.replicas is left out so the forced
+# server-side apply does not take the field back from the autoscaler.
+def split_manifest(manifest, manifest_hash, drop_replicas=False):
+    documents = []
+    for document in yaml.safe_load_all(manifest):
+        if not document:
+            continue
+        kind = document.get("kind", "")
+        if kind == "Deployment":
+            metadata = document.setdefault("metadata", {})
+            metadata["annotations"] = dict(metadata.get("annotations") or {})
+            metadata["annotations"][MANIFEST_HASH_ANNOTATION] = manifest_hash
+            if drop_replicas:
+                document.get("spec", {}).pop("replicas", None)
+        documents.append((kind, yaml.safe_dump(document, sort_keys=False)))
+    return documents
+
+APPLY_ARGS = ["kubectl", "apply", "--server-side", "--force-conflicts", "--field-manager=deploy-agent", "-f", "-"]
+
+def apply_error(result):
+    print(f"kubectl apply stdout: {result.stdout}")
+    if result.returncode != 0:
+        print(f"kubectl apply stderr: {result.stderr}")
+        return result.stderr.strip()
+    return None
+
+def apply_document(document):
+    return apply_error(run_command(APPLY_ARGS, input=document))
+
+# Server-side apply in two waves: foundation kinds first, then the rest concurrently
+def apply_documents(documents):
+    waves = [
+        [d for kind, d in documents if kind in FOUNDATION_KINDS],
+        [d for kind, d in documents if kind not in FOUNDATION_KINDS],
+    ]
+    errors = []
+    for wave in waves:
+        if not wave:
+            continue
+        results = run_commands([{"args": APPLY_ARGS, "input": d, "label": "kubectl apply"} for d in wave])
+        errors.extend(e for e in map(apply_error, results) if e)
+        if errors:
+            break
+    return errors
+
+SCALING_REPLICAS = [int(n) for n in os.getenv("SCALING_REPLICAS", "1,2,4").split(",")]
+SCALING_TARGET_RPS = float(os.getenv("SCALING_TARGET_RPS", "0"))
+HPA_TARGET_UTILIZATION = int(os.getenv("HPA_TARGET_UTILIZATION", "70"))
+# Set to 1 to patch the measured resources into the deployment and apply the HPA
+SCALING_APPLY = os.getenv("SCALING_APPLY", "0") == "1"
+PROFILE_SERVICE = "microservice-profile"
+# Cumulative CPU time of the pod's cgroup in microseconds: cgroup v2 cpu.stat, else v1 cpuacct (nanoseconds)
+CPU_USAGE_SCRIPT = ("cat /sys/fs/cgroup/cpu.stat 2>/dev/null || "
+                    "echo usage_usec $(( $(cat /sys/fs/cgroup/cpuacct/cpuacct.usage) / 1000 ))")
+
+# NodePort twin of microservice-service, so load reaches the same pods through kube-proxy from the runner
+PROFILE_SERVICE_MANIFEST = f"""apiVersion: v1
+kind: Service
+metadata:
+  name: {PROFILE_SERVICE}
+  namespace: default
+spec:
+  selector:
+    app: microservice
+  ports:
+  - protocol: TCP
+    port: 80
+    targetPort: 5000
+  type: NodePort
+"""
+
+def scale_deployment(deployment, replicas):
+    result = run_command(
+        ["kubectl", "scale", f"deployment/{deployment}", f"--replicas={replicas}"]
+    )
+    if result.returncode != 0:
+        return False, result.stderr.strip()
+    return wait_for_rollout(deployment, ROLLOUT_TIMEOUT)
+
+def current_resources():
+    result = run_command(
+        ["kubectl", "get", "deployment/microservice", "-o", "jsonpath={.spec.template.spec.containers[0].resources}"]
+    )
+    return json.loads(result.stdout) if result.returncode == 0 and result.stdout.strip() else {}
+
+# Kubernetes CPU quantity ("500m", "1", "0.5") in millicores
+def parse_cpu(quantity):
+    quantity = str(quantity).strip()
+    return float(quantity[:-1]) if quantity.endswith("m") else float(quantity) * 1000
+
+def running_pods():
+    result = run_command(
+        ["kubectl", "get", "pods", "-l", "app=microservice", "--field-selector=status.phase=Running",
+         "-o", "jsonpath={.items[*].metadata.name}"]
+    )
+    return result.stdout.split() if result.returncode == 0 else []
+
+# CPU time used so far by each pod, read from its cgroup; pods that cannot be read are left out
+def pod_cpu_usage(pods):
+    results = run_commands([{"args": ["kubectl", "exec", pod, "--", "sh", "-c", CPU_USAGE_SCRIPT],
+                             "label": f"cpu {pod}"} for pod in pods])
+    usage = {}
+    for pod, result in zip(pods, results):
+        match = re.search(r"^usage_usec (\d+)", result.stdout, flags=re.MULTILINE)
+        if result.returncode == 0 and match:
+            usage[pod] = int(match.group(1))
+    return usage
+
+# Mean CPU per pod in millicores between two usage readings taken elapsed seconds apart
+def mean_pod_millicores(before, after, elapsed):
+    pods = [pod for pod in before if pod in after]
+    if not pods or elapsed <= 0:
+        return None
+    return sum(after[pod] - before[pod] for pod in pods) / len(pods) / 1000 / elapsed
+
+# HPA sized from the measured curve. maxReplicas covers SCALING_TARGET_RPS at the utilization target.
+# Without a target only the peak the profile itself reached is known, so maxReplicas is then a lower
+# bound rather than a sizing. CPU requests are set to what one pod used at its measured ceiling, so
+# the utilization target is a share of capacity.
+def autoscaling_manifest(curve, per_pod_rps, base_replicas, resources):
+    usable_rps = per_pod_rps * HPA_TARGET_UTILIZATION / 100
+    target_rps = SCALING_TARGET_RPS or max(point["throughput_rps"] for point in curve)
+    min_replicas = max(1, base_replicas)
+    max_replicas = max(min_replicas, math.ceil(target_rps / usable_rps)) if usable_rps else min_replicas
+    requests = dict(resources.get("requests", {}))
+    limits = dict(resources.get("limits", {}))
+    measured = next((p["pod_cpu_millicores"] for p in curve if p.get("pod_cpu_millicores")), None)
+    if measured:
+        cpu_millicores = max(10, int(round(measured, -1)))
+        requests["cpu"] = f"{cpu_millicores}m"
+        if "cpu" in limits and parse_cpu(limits["cpu"]) < cpu_millicores:
+            limits["cpu"] = f"{cpu_millicores}m"
+    recommended = {"requests": requests, "limits": limits}
+    manifest = f"""apiVersion: autoscaling/v2
+kind: HorizontalPodAutoscaler
+metadata:
+  name: microservice
+  namespace: default
+spec:
+  scaleTargetRef:
+    apiVersion: apps/v1
+    kind: Deployment
+    name: microservice
+  minReplicas: {min_replicas}
+  maxReplicas: {max_replicas}
+  metrics:
+  - type: Resource
+    resource:
+      name: cpu
+      target:
+        type: Utilization
+        averageUtilization: {HPA_TARGET_UTILIZATION}
+"""
+    # Strategic merge patch for kubectl patch deployment/microservice --patch-file resources-patch.yaml
+    patch = json.dumps({"spec": {"template": {"spec": {"containers": [
+        {"name": "microservice", "resources": recommended}]}}}}, indent=2) + "\n"
+    return manifest, patch, {"min_replicas": min_replicas, "max_replicas": max_replicas,
+                             "target_rps": round(target_rps, 2),
+                             "target_source": "SCALING_TARGET_RPS" if SCALING_TARGET_RPS else "measured peak",
+                             "max_replicas_is_lower_bound": not SCALING_TARGET_RPS,
+                             "measured_pod_cpu_millicores": round(measured, 1) if measured else None,
+                             "resources": recommended}
+
+def apply_autoscaling(patch_path, manifest, report):
+    result = run_command(["kubectl", "patch", "deployment/microservice", "--patch-file", patch_path])
+    if result.returncode != 0:
+        report.add_issue(f"Resource patch failed: {result.stderr.strip()}")
+        return
+    rolled_out, output = wait_for_rollout("microservice", ROLLOUT_TIMEOUT)
+    if not rolled_out:
+        report.add_issue(f"Rollout after resource patch did not complete: {output}")
+        return
+    error = apply_document(manifest)
+    if error:
+        report.add_issue(f"HPA apply failed: {error}", "Install metrics-server for CPU-based autoscaling")
+
+# Measure aggregate throughput at each replica count and derive autoscaling settings
+def profile_scaling(report):
+    scaling = {"curve": []}
+    report.details["scaling"] = scaling
+    config = load_test_config()
+    discovery = ContainerDiscovery()
+    result = run_command(
+        ["kubectl", "get", "deployment/microservice", "-o", "jsonpath={.spec.replicas}"]
+    )
+    base_replicas = int(result.stdout.strip()) if result.returncode == 0 and result.stdout.strip() else 1
     try:
-        if not os.path.exists("deployment.yaml"):
-            summary["status"] = "failed"
-            summary["issues"].append("deployment.yaml not found")
-            summary["mitigations"].append("Ensure deployment.yaml is in the repository root")
-            try:
-                with open("deploy_report.json", "w") as f:
-                    json.dump(summary, f, indent=2)
-                print("Wrote deploy_report.json for missing deployment.yaml")
-            except Exception as e:
-                print(f"Failed to write deploy_report.json: {str(e)}")
-            return json.dumps(summary, indent=2)
-
-        # Retry kind create cluster up to 3 times
-        for attempt in range(1, 4):
-            print(f"Attempt {attempt}: Running kind create cluster...")
-            result = subprocess.run(
-                ["kind", "create", "cluster", "--name", "demo-cluster", "--config", "kind-config.yaml"],
-                capture_output=True, text=True
-            )
-            print(f"kind create cluster stdout: {result.stdout}")
-            print(f"kind create cluster stderr: {result.stderr}")
-            if result.returncode == 0:
+        if apply_document(PROFILE_SERVICE_MANIFEST):
+            report.add_issue("Scaling profile skipped: could not create the NodePort profile service")
+            return
+        base_url = discovery.service_url(PROFILE_SERVICE, cluster=CLUSTER_NAME)
+        print(f"Profiling scaling through {base_url}")
+        for replicas in SCALING_REPLICAS:
+            scaled, output = scale_deployment("microservice", replicas)
+            if not scaled:
+                report.add_issue(f"Scaling to {replicas} replicas failed: {output}")
                 break
-            print(f"Attempt {attempt} failed, retrying in 5 seconds...")
-            summary["issues"].append(f"kind create cluster attempt {attempt} failed: {result.stderr}")
-            time.sleep(5)
+            pods = running_pods()
+            cpu_before = pod_cpu_usage(pods)
+            step_started = time.perf_counter()
+            result = run_load_test(
+                base_url,
+                concurrency=max(config["concurrency"], 4 * replicas),
+                duration=config["duration"],
+                endpoints=config["endpoints"],
+                timeout=config["timeout"],
+            )
+            millicores = mean_pod_millicores(cpu_before, pod_cpu_usage(pods), time.perf_counter() - step_started)
+            point = {
+                "replicas": replicas,
+                "throughput_rps": result["overall"]["throughput_rps"],
+                "p95_ms": result["overall"]["latency_ms"]["p95"],
+                "error_rate": result["overall"]["error_rate"],
+                "pod_cpu_millicores": round(millicores, 1) if millicores is not None else None,
+            }
+            print(f"Scaling point: {json.dumps(point)}")
+            scaling["curve"].append(point)
+
+        curve = scaling["curve"]
+        if not curve:
+            return
+        per_pod_rps = curve[0]["throughput_rps"] / curve[0]["replicas"]
+        scaling["per_pod_rps"] = round(per_pod_rps, 2)
+        for point in curve:
+            ideal = per_pod_rps * point["replicas"]
+            point["efficiency"] = round(point["throughput_rps"] / ideal, 3) if ideal else 0.0
+        scaling["scales_out"] = len(curve) > 1 and curve[-1]["throughput_rps"] > curve[0]["throughput_rps"] * 1.1
+        if len(curve) > 1 and not scaling["scales_out"]:
+            report.add_issue(
+                f"Aggregate RPS did not increase from {curve[0]['replicas']} to {curve[-1]['replicas']} replicas",
+                "Check for a shared bottleneck (node CPU, kube-proxy, or the load generator)"
+            )
+
+        manifest, patch, hpa = autoscaling_manifest(curve, per_pod_rps, base_replicas, current_resources())
+        scaling["hpa"] = hpa
+        if not hpa["measured_pod_cpu_millicores"]:
+            report.add_issue("Pod CPU could not be read from the cgroup; resources-patch.yaml keeps the current requests")
+        with open("hpa.yaml", "w") as f:
+            f.write(manifest)
+        with open("resources-patch.yaml", "w") as f:
+            f.write(patch)
+        print("Wrote hpa.yaml and resources-patch.yaml")
+        if hpa["max_replicas_is_lower_bound"]:
+            report.add_issue(f"maxReplicas {hpa['max_replicas']} only covers the measured peak and is a lower bound",
+                             "Set SCALING_TARGET_RPS to the expected peak load to size the HPA")
+        if SCALING_APPLY and hpa["max_replicas_is_lower_bound"]:
+            report.add_issue("HPA not applied: SCALING_APPLY needs SCALING_TARGET_RPS")
+        elif SCALING_APPLY:
+            apply_autoscaling("resources-patch.yaml", manifest, report)
+    except Exception as e:
+        print(f"Scaling profile error: {str(e)}")
+        report.add_issue(f"Scaling profile failed: {str(e)}")
+    finally:
+        discovery.close()
+        scale_deployment("microservice", base_replicas)
+        run_command(["kubectl", "delete", "service", PROFILE_SERVICE, "--ignore-not-found"])
+
+# Tag the local image with its content digest. The digest tag pins the pods to exactly
+# this image and lets IfNotPresent skip registry pulls. Needs only the docker daemon,
+# so it runs while the kind cluster is still being created.
+def prepare_image(image, report):
+    result = run_command(["docker", "image", "inspect", "--format", "{{.Id}}", image])
+    if result.returncode != 0:
+        print(f"Image {image} not present locally, pulling...")
+        pull = run_command(["docker", "pull", image], stream=True)
+        if pull.returncode != 0:
+            report.add_issue(f"Image side-load skipped, docker pull failed: {pull.stderr.strip()}",
+                             "Build the image locally or check registry access")
+            return None
+        result = run_command(["docker", "image", "inspect", "--format", "{{.Id}}", image])
+    digest = result.stdout.strip()
+    report.details["image_digest"] = digest
+    repository = image.rsplit(":", 1)[0] if ":" in image.rsplit("/", 1)[-1] else image
+    pinned = f"{repository}:sha-{digest.split(':')[-1][:12]}"
+    run_command(["docker", "tag", image, pinned])
+    return pinned
+
+# Load the digest-tagged image into the kind nodes
+def side_load_image(pinned, report):
+    print(f"Loading {pinned} into kind cluster {CLUSTER_NAME}...")
+    result = run_command(["kind", "load", "docker-image", pinned, "--name", CLUSTER_NAME], stream=True)
+    if result.returncode != 0:
+        print(f"kind load stderr: {result.stderr}")
+        report.add_issue(f"kind load docker-image failed: {result.stderr.strip()}",
+                         "Check kind installation and free disk space on the node")
+        return None
+    return pinned
+
+def cluster_exists(name):
+    result = run_command(["kind", "get", "clusters"])
+    return result.returncode == 0 and name in result.stdout.split()
+
+# An existing cluster is reused when its kubeconfig can be exported and every node is Ready
+def cluster_healthy(name):
+    result = run_command(["kind", "export", "kubeconfig", "--name", name])
+    if result.returncode != 0:
+        print(f"kind export kubeconfig stderr: {result.stderr}")
+        return False
+    ready, _ = wait_for("nodes", "all", 10)
+    return ready
+
+def ensure_cluster(report):
+    if cluster_exists(CLUSTER_NAME):
+        if cluster_healthy(CLUSTER_NAME):
+            print(f"Reusing healthy kind cluster {CLUSTER_NAME}")
+            report.details["cluster"] = "reused"
+            return True
+        print(f"Kind cluster {CLUSTER_NAME} is unhealthy, recreating...")
+        run_command(["kind", "delete", "cluster", "--name", CLUSTER_NAME])
+
+    for attempt in range(1, CREATE_ATTEMPTS + 1):
+        print(f"Attempt {attempt}: Running kind create cluster...")
+        result = run_command(
+            ["kind", "create", "cluster", "--name", CLUSTER_NAME, "--config", "kind-config.yaml",
+             "--wait", f"{NODE_READY_TIMEOUT}s"],
+            stream=True
+        )
+        if result.returncode == 0 or (cluster_exists(CLUSTER_NAME) and cluster_healthy(CLUSTER_NAME)):
+            ready, output = wait_for("nodes", "all", NODE_READY_TIMEOUT)
+            if ready:
+                report.details["cluster"] = "created"
+                return True
+            report.add_issue(f"Nodes not ready after {NODE_READY_TIMEOUT}s: {output}")
         else:
-            summary["status"] = "failed"
-            summary["issues"].append("kind create cluster failed after 3 attempts")
-            summary["mitigations"].append("Check kind-config.yaml syntax, KinD installation, and disk space")
-            try:
-                with open("deploy_report.json", "w") as f:
-                    json.dump(summary, f, indent=2)
-                print("Wrote deploy_report.json for kind create cluster failure")
-            except Exception as e:
-                print(f"Failed to write deploy_report.json: {str(e)}")
-            return json.dumps(summary, indent=2)
+            report.add_issue(f"kind create cluster attempt {attempt} failed: {result.stderr}")
+        run_command(["kind", "delete", "cluster", "--name", CLUSTER_NAME])
+        if attempt < CREATE_ATTEMPTS:
+            delay = backoff_delay(attempt)
+            print(f"Attempt {attempt} failed, retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+    report.add_issue(f"kind create cluster failed after {CREATE_ATTEMPTS} attempts")
+    return False
+
+def deploy(report):
+    if not os.path.exists("deployment.yaml"):
+        report.fail("deployment.yaml not found", "Ensure deployment.yaml is in the repository root")
+        return
+
+    deploy_started = time.perf_counter()
+    timings = report.timings
+
+    # Pull and digest-tag the image while kind brings the cluster up
+    def timed_prepare_image():
+        started = time.perf_counter()
+        with span("image prepare", stage="deploy", image=IMAGE_NAME):
+            pinned = prepare_image(IMAGE_NAME, report)
+        timings["image_prepare_s"] = round(time.perf_counter() - started, 3)
+        return pinned
+
+    phase_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prepared = executor.submit(timed_prepare_image)
+        with span("kind create", stage="deploy", cluster=CLUSTER_NAME):
+            cluster_ready = ensure_cluster(report)
+        timings["cluster_create_s"] = round(time.perf_counter() - phase_started, 3)
+        pinned_image = prepared.result()
+    timings["cluster_and_image_s"] = round(time.perf_counter() - phase_started, 3)
+    if not cluster_ready:
+        report.status = "failed"
+        report.add_mitigation("Check kind-config.yaml syntax, KinD installation, and disk space")
+        return
 
+    if pinned_image:
+        phase_started = time.perf_counter()
+        with span("kind load image", stage="deploy", image=pinned_image):
+            pinned_image = side_load_image(pinned_image, report)
+        timings["image_load_s"] = round(time.perf_counter() - phase_started, 3)
+    with open("deployment.yaml", "r") as f:
+        manifest = f.read()
+    if pinned_image:
+        manifest, pinned = pin_deployment_image(manifest, "microservice", pinned_image)
+        if not pinned:
+            report.fail(f"No microservice container in deployment.yaml to pin to {pinned_image}",
+                        "Keep the container name in deployment.yaml equal to the deployment name")
+            return
+        report.details["image"] = pinned_image
+
+    # Skip apply and rollout when the live deployment already carries this manifest hash
+    autoscaled = hpa_exists("microservice")
+    report.details["autoscaled"] = autoscaled
+    manifest_hash = hashlib.sha256(
+        (manifest + report.details.get("image_digest", "") + ("hpa" if autoscaled else "")).encode()
+    ).hexdigest()
+    report.details["manifest_hash"] = manifest_hash
+    live_hash = live_manifest_hash("microservice")
+    if live_hash == manifest_hash:
+        print(f"Live deployment already at manifest {manifest_hash[:12]}, skipping apply")
+        report.details["apply"] = "skipped"
+        report.status = "success"
+        report.details["deployment"] = "microservice"
+        timings["apply_s"] = 0.0
+        timings["pods_ready_s"] = 0.0
+    else:
         print("Running kubectl apply...")
-        result = subprocess.run(
-            ["kubectl", "apply", "-f", "deployment.yaml"],
-            capture_output=True, text=True
-        )
-        print(f"kubectl apply stdout: {result.stdout}")
-        print(f"kubectl apply stderr: {result.stderr}")
-        if result.returncode == 0:
-            summary["status"] = "success"
-            summary["deployment"] = "microservice"
+        phase_started = time.perf_counter()
+        documents = split_manifest(manifest, manifest_hash, drop_replicas=autoscaled)
+        with span("kubectl apply", stage="deploy", documents=len(documents)):
+            errors = apply_documents(documents)
+        timings["apply_s"] = round(time.perf_counter() - phase_started, 3)
+        report.details["apply"] = "applied"
+        if errors:
+            report.status = "failed"
+            for error in errors:
+                report.add_issue(f"kubectl apply failed: {error}")
+            report.add_mitigation("Check deployment.yaml and KinD cluster")
         else:
-            summary["status"] = "failed"
-            summary["issues"].append(f"kubectl apply failed: {result.stderr}")
-            summary["mitigations"].append("Check deployment.yaml and KinD cluster")
-        try:
-            print(f"Writing deploy_report.json to {os.path.abspath('deploy_report.json')}")
-            with open("deploy_report.json", "w") as f:
-                json.dump(summary, f, indent=2)
-            print("Wrote deploy_report.json successfully")
-        except Exception as e:
-            print(f"Failed to write deploy_report.json: {str(e)}")
-            summary["issues"].append(f"File write error: {str(e)}")
-            summary["mitigations"].append("Check disk space and permissions")
-        return json.dumps(summary, indent=2)
+            phase_started = time.perf_counter()
+            with span("rollout", stage="deploy"):
+                rolled_out, output = wait_for_rollout("microservice", ROLLOUT_TIMEOUT)
+            timings["pods_ready_s"] = round(time.perf_counter() - phase_started, 3)
+            if rolled_out:
+                report.status = "success"
+                report.details["deployment"] = "microservice"
+            else:
+                report.fail(f"Rollout did not complete within {ROLLOUT_TIMEOUT}s: {output}",
+                            "Check pod events with kubectl describe pods -l app=microservice")
+    # The pods must run the pinned image, or IfNotPresent keeps serving whatever :latest the node has
+    if report.status == "success" and report.details.get("image"):
+        running = live_image("microservice")
+        if running != report.details["image"]:
+            report.fail(f"Deployment runs {running or 'an unknown image'} instead of pinned {report.details['image']}",
+                        "Check the container image in deployment.yaml and kubectl describe deployment/microservice")
+    if report.status == "success" and os.getenv("SCALING_PROFILE", "0") == "1":
+        phase_started = time.perf_counter()
+        with span("scaling profile", stage="deploy"):
+            profile_scaling(report)
+        timings["scaling_profile_s"] = round(time.perf_counter() - phase_started, 3)
+    timings["total_s"] = round(time.perf_counter() - deploy_started, 3)
+    print(f"Deploy timings: {json.dumps(timings)}")
+
+# Deploy to Kubernetes; the report is written once, whatever the outcome
+def deploy_to_kubernetes(_):
+    report = Report("deploy")
+    try:
+        deploy(report)
     except Exception as e:
-        summary["status"] = "failed"
-        summary["issues"].append(f"Unexpected error: {str(e)}")
-        summary["mitigations"].append("Check kubectl installation and KinD cluster")
         print(f"Unexpected error: {str(e)}")
-        try:
-            print(f"Writing deploy_report.json to {os.path.abspath('deploy_report.json')}")
-            with open("deploy_report.json", "w") as f:
-                json.dump(summary, f, indent=2)
-            print("Wrote deploy_report.json for unexpected error")
-        except Exception as e:
-            print(f"Failed to write deploy_report.json: {str(e)}")
-        return json.dumps(summary, indent=2)
+        report.fail(f"Unexpected error: {str(e)}", "Check kubectl installation and KinD cluster")
+    write_report(report)
+    return report.to_json(indent=2)
 
 # Register functions
 try:
@@ -181,24 +574,15 @@ try:
     print("Function registered successfully")
 except Exception as e:
     print(f"Failed to register function: {str(e)}")
-    summary = {
-        "status": "failed",
-        "issues": [f"Function registration failed: {str(e)}"],
-        "mitigations": ["Check autogen version"]
-    }
-    try:
-        with open("deploy_report.json", "w") as f:
-            json.dump(summary, f, indent=2)
-        print("Wrote deploy_report.json for function registration error")
-    except Exception as e:
-        print(f"Failed to write deploy_report.json: {str(e)}")
+    write_report(Report.failed("deploy", f"Function registration failed: {str(e)}", "Check autogen version"))
     exit(1)
 
 if __name__ == "__main__":
+    result = None
     try:
         print("Initiating chat to deploy application...")
         user_proxy = autogen.UserProxyAgent(name="UserProxy")
-        result = deploy_to_kubernetes(user_proxy)
+        result = run_profiled("deploy", deploy_to_kubernetes, user_proxy)
         print(f"deploy_to_kubernetes result: {result}")
         autogen.initiate_chats([{
             "sender": user_proxy,
@@ -209,15 +593,8 @@ if __name__ == "__main__":
         print("Chat initiated successfully")
     except Exception as e:
         print(f"Chat initiation failed: {str(e)}")
-        summary = {
-            "status": "failed",
-            "issues": [f"Chat initiation failed: {str(e)}"],
-            "mitigations": ["Check autogen and dependencies"]
-        }
-        try:
-            with open("deploy_report.json", "w") as f:
-                json.dump(summary, f, indent=2)
-            print("Wrote deploy_report.json for chat initiation error")
-        except Exception as e:
-            print(f"Failed to write deploy_report.json: {str(e)}")
+        # Keep the deploy outcome if the stage already ran
+        report = Report.from_json(result, "deploy") if result else Report("deploy")
+        report.fail(f"Chat initiation failed: {str(e)}", "Check autogen and dependencies")
+        write_report(report)
         exit(1)
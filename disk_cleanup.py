@@ -0,0 +1,121 @@
+import json
+import os
+import shutil
+import sys
+import threading
+from docker_discovery import DockerClient, DiscoveryError
+
+# Prune only when the Docker filesystem is fuller than this fraction
+DEFAULT_THRESHOLD = float(os.getenv("CLEANUP_THRESHOLD", "0.85"))
+
+class CleanupManager:
+    """Frees Docker disk space in escalating steps, only while usage is above the threshold."""
+
+    def __init__(self, client=None, threshold=DEFAULT_THRESHOLD, protected_images=(), path=None):
+        self.client = client or DockerClient()
+        self.threshold = threshold
+        self.protected_images = set(protected_images)
+        self.path = path
+        self.result = None
+        self._thread = None
+
+    def _disk_path(self):
+        if self.path:
+            return self.path
+        try:
+            root = self.client.get("/info").get("DockerRootDir", "/")
+        except DiscoveryError:
+            root = "/"
+        return root if os.path.exists(root) else "/"
+
+    def usage(self, path):
+        total, used, _ = shutil.disk_usage(path)
+        return used / total if total else 0.0
+
+    def _protected_ids(self):
+        ids = set()
+        for image in self.protected_images:
+            try:
+                ids.add(self.client.get(f"/images/{image}/json")["Id"])
+            except DiscoveryError:
+                continue
+        return ids
+
+    # Unused, unprotected images, largest first
+    def _removable_images(self):
+        protected = self._protected_ids()
+        in_use = {c["ImageID"] for c in self.client.get("/containers/json", {"all": "1"})}
+        images = []
+        for image in self.client.get("/images/json"):
+            tags = set(image.get("RepoTags") or [])
+            if image["Id"] in protected or image["Id"] in in_use or tags & self.protected_images:
+                continue
+            images.append(image)
+        return sorted(images, key=lambda image: image.get("Size", 0), reverse=True)
+
+    def run(self):
+        path = self._disk_path()
+        before = self.usage(path)
+        result = {"path": path, "threshold": self.threshold, "usage_before": round(before, 4),
+                  "steps": [], "reclaimed_bytes": 0}
+        print(f"Disk usage on {path}: {before:.1%} (threshold {self.threshold:.0%})")
+        if before < self.threshold:
+            print("Disk usage below threshold, skipping cleanup")
+            result["usage_after"] = result["usage_before"]
+            self.result = result
+            return result
+
+        steps = [
+            ("containers", "/containers/prune", None),
+            ("dangling_images", "/images/prune", {"filters": json.dumps({"dangling": ["true"]})}),
+            ("build_cache", "/build/prune", None),
+        ]
+        for name, path_, params in steps:
+            try:
+                response = self.client.request("POST", path_, params) or {}
+                reclaimed = response.get("SpaceReclaimed", 0)
+                result["reclaimed_bytes"] += reclaimed
+                result["steps"].append(name)
+                print(f"Pruned {name}: reclaimed {reclaimed} bytes")
+            except DiscoveryError as e:
+                print(f"Failed to prune {name}: {str(e)}")
+            if self.usage(path) < self.threshold:
+                break
+        else:
+            for image in self._removable_images():
+                if self.usage(path) < self.threshold:
+                    break
+                try:
+                    self.client.request("DELETE", f"/images/{image['Id']}")
+                    result["reclaimed_bytes"] += image.get("Size", 0)
+                    result["steps"].append(f"image:{image['Id'][7:19]}")
+                    print(f"Removed unused image {image.get('RepoTags') or image['Id']}")
+                except DiscoveryError as e:
+                    print(f"Failed to remove image {image['Id']}: {str(e)}")
+
+        result["usage_after"] = round(self.usage(path), 4)
+        print(f"Disk usage after cleanup: {result['usage_after']:.1%}")
+        self.result = result
+        return result
+
+    def _run_safely(self):
+        try:
+            self.run()
+        except Exception as e:
+            print(f"Disk cleanup failed: {str(e)}")
+            self.result = {"error": str(e)}
+
+    def start_background(self):
+        self._thread = threading.Thread(target=self._run_safely, name="disk-cleanup", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.result
+
+if __name__ == "__main__":
+    manager = CleanupManager(protected_images=sys.argv[1:])
+    manager._run_safely()
+    print(json.dumps(manager.result, indent=2))
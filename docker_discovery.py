@@ -0,0 +1,175 @@
+import http.client
+import json
+import os
+import queue
+import socket
+import subprocess
+import threading
+import urllib.parse
+from command_runner import run_command
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+PORT_FORWARD_TIMEOUT = float(os.getenv("PORT_FORWARD_TIMEOUT", "30"))
+
+class DiscoveryError(Exception):
+    pass
+
+def docker_socket_path():
+    host = os.getenv("DOCKER_HOST", "")
+    if host.startswith("unix://"):
+        return host[len("unix://"):]
+    return os.getenv("DOCKER_SOCKET", DEFAULT_SOCKET)
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=10):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+class DockerClient:
+    """Minimal Docker Engine API client that keeps one connection to the daemon socket open."""
+
+    def __init__(self, socket_path=None, timeout=10):
+        self.socket_path = socket_path or docker_socket_path()
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = UnixHTTPConnection(self.socket_path, self.timeout)
+        return self._conn
+
+    def request(self, method, path, params=None, body=None):
+        if params:
+            path = f"{path}?{urllib.parse.urlencode(params)}"
+        payload = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        with self._lock:
+            # Retry once on a fresh connection if the daemon closed the idle one
+            for attempt in range(2):
+                conn = self._connection()
+                try:
+                    conn.request(method, path, body=payload, headers=headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                    break
+                except (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError, ConnectionResetError):
+                    self.close_connection()
+                    if attempt:
+                        raise
+                except OSError as e:
+                    self.close_connection()
+                    raise DiscoveryError(f"Docker socket {self.socket_path} unavailable: {str(e)}")
+        if response.status >= 400:
+            raise DiscoveryError(f"Docker API {method} {path} returned {response.status}: {data.decode(errors='replace')}")
+        return json.loads(data) if data else None
+
+    def get(self, path, params=None):
+        return self.request("GET", path, params)
+
+    def close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class ContainerDiscovery:
+    """Resolves test targets through the Docker Engine API, caching results for the run."""
+
+    def __init__(self, client=None):
+        self.client = client or DockerClient()
+        self._cache = {}
+        self._port_forwards = []
+
+    def _cached(self, key, resolve):
+        if key not in self._cache:
+            self._cache[key] = resolve()
+        return self._cache[key]
+
+    def list_containers(self, filters):
+        return self.client.get("/containers/json", {"filters": json.dumps(filters)})
+
+    def find_container(self, image):
+        def resolve():
+            containers = self.list_containers({"ancestor": [image], "status": ["running"]})
+            return containers[0] if containers else None
+        return self._cached(("container", image), resolve)
+
+    # Base URL for a running container of image, preferring its bridge IP over a published port
+    def container_url(self, image, port=5000):
+        def resolve():
+            container = self.find_container(image)
+            if container is None:
+                raise DiscoveryError(f"No running container for image {image}")
+            networks = container.get("NetworkSettings", {}).get("Networks", {})
+            for network in networks.values():
+                if network.get("IPAddress"):
+                    return f"http://{network['IPAddress']}:{port}"
+            for mapping in container.get("Ports", []):
+                if mapping.get("PrivatePort") == port and mapping.get("PublicPort"):
+                    return f"http://localhost:{mapping['PublicPort']}"
+            raise DiscoveryError(f"Container {container['Id'][:12]} has no reachable address")
+        return self._cached(("container_url", image, port), resolve)
+
+    def kind_node_ip(self, cluster):
+        def resolve():
+            containers = self.list_containers({"label": [
+                f"io.x-k8s.kind.cluster={cluster}",
+                "io.x-k8s.kind.role=control-plane",
+            ]})
+            for container in containers:
+                for network in container.get("NetworkSettings", {}).get("Networks", {}).values():
+                    if network.get("IPAddress"):
+                        return network["IPAddress"]
+            raise DiscoveryError(f"No kind control-plane node found for cluster {cluster}")
+        return self._cached(("kind_node", cluster), resolve)
+
+    # Base URL for a Service in a kind cluster: node IP and NodePort when exposed, otherwise a port-forward
+    def service_url(self, service, cluster="demo-cluster", namespace="default"):
+        def resolve():
+            result = run_command(["kubectl", "get", "service", service, "-n", namespace, "-o", "json"])
+            if result.returncode != 0:
+                raise DiscoveryError(f"kubectl get service {service} failed: {result.stderr.strip()}")
+            ports = json.loads(result.stdout)["spec"].get("ports", [])
+            if not ports:
+                raise DiscoveryError(f"Service {service} exposes no ports")
+            if ports[0].get("nodePort"):
+                return f"http://{self.kind_node_ip(cluster)}:{ports[0]['nodePort']}"
+            return self._port_forward(service, namespace, ports[0]["port"])
+        return self._cached(("service_url", service, cluster, namespace), resolve)
+
+    def _port_forward(self, service, namespace, port):
+        process = subprocess.Popen(
+            ["kubectl", "port-forward", f"service/{service}", f":{port}", "-n", namespace],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        self._port_forwards.append(process)
+        first_line = queue.Queue(maxsize=1)
+
+        # Hand over the first line, then keep draining per-connection log lines so kubectl never blocks on a full pipe
+        def drain():
+            first_line.put(process.stdout.readline())
+            process.stdout.read()
+
+        threading.Thread(target=drain, daemon=True).start()
+        # kubectl prints "Forwarding from 127.0.0.1:<local> -> <port>" once the tunnel is ready
+        try:
+            line = first_line.get(timeout=PORT_FORWARD_TIMEOUT)
+        except queue.Empty:
+            process.terminate()
+            raise DiscoveryError(f"kubectl port-forward for {service} printed nothing within {PORT_FORWARD_TIMEOUT}s")
+        if "Forwarding from" not in line:
+            raise DiscoveryError(f"kubectl port-forward for {service} failed: {line.strip()}")
+        local_port = line.split("->")[0].rsplit(":", 1)[1].strip()
+        return f"http://127.0.0.1:{local_port}"
+
+    def close(self):
+        for process in self._port_forwards:
+            process.terminate()
+        self._port_forwards = []
+        self.client.close_connection()
@@ -0,0 +1,129 @@
+import argparse
+import json
+import math
+import os
+import time
+
+EXEC_PROFILE = os.getenv("AGENT_EXEC_PROFILE", "auto")
+PIN_THREADS = os.getenv("AGENT_EXEC_PIN", "0") == "1"
+PROFILES = ("default", "auto", "single")
+
+_applied = None
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+# CPUs allowed by the cgroup CPU quota (v2 cpu.max, else v1 cfs quota/period); None when unlimited
+def cgroup_cpu_limit(root="/sys/fs/cgroup"):
+    cpu_max = _read(os.path.join(root, "cpu.max"))
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return max(1, math.ceil(int(quota) / int(period)))
+        return None
+    quota = _read(os.path.join(root, "cpu", "cpu.cfs_quota_us")) or _read(os.path.join(root, "cpu.cfs_quota_us"))
+    period = _read(os.path.join(root, "cpu", "cpu.cfs_period_us")) or _read(os.path.join(root, "cpu.cfs_period_us"))
+    if quota and period and int(quota) > 0:
+        return max(1, math.ceil(int(quota) / int(period)))
+    return None
+
+def affinity_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+# Usable CPUs: the affinity mask, further capped by the cgroup quota (a 500m pod gets 1, not the node's count)
+def available_cpus():
+    cpus = len(affinity_cpus())
+    limit = cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+def profile_settings(name):
+    cpus = available_cpus()
+    if name == "single":
+        return {"intra_op_threads": 1, "inter_op_threads": 1}
+    if name == "auto":
+        # generate() is a sequential decode loop, so one inter-op thread is enough
+        return {"intra_op_threads": cpus, "inter_op_threads": 1}
+    return {}
+
+# Configure torch threading once per process, before the model runs its first op
+def apply_profile(name=None, pin=None):
+    global _applied
+    if _applied is not None:
+        return _applied
+    name = name or EXEC_PROFILE
+    pin = PIN_THREADS if pin is None else pin
+    if name not in PROFILES:
+        print(f"Unknown execution profile {name}, using auto")
+        name = "auto"
+    import torch
+
+    settings = profile_settings(name)
+    profile = {"profile": name, "available_cpus": available_cpus(), "cgroup_cpu_limit": cgroup_cpu_limit()}
+    if settings:
+        threads = settings["intra_op_threads"]
+        if pin and hasattr(os, "sched_setaffinity"):
+            # Threads inherit the process mask, so pinning before torch starts its pool pins them all
+            os.sched_setaffinity(0, affinity_cpus()[:threads])
+            profile["pinned_cpus"] = sorted(os.sched_getaffinity(0))
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(settings["inter_op_threads"])
+        except RuntimeError as e:
+            # Only allowed before any inter-op work has started in this process
+            print(f"Could not set inter-op threads: {str(e)}")
+        # Child processes that use OpenMP/MKL follow the same limit
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        os.environ["MKL_NUM_THREADS"] = str(threads)
+    profile["intra_op_threads"] = torch.get_num_threads()
+    profile["inter_op_threads"] = torch.get_num_interop_threads()
+    print(f"Execution profile: {json.dumps(profile)}")
+    _applied = profile
+    return profile
+
+# Greedy decode of a fixed number of tokens so runs are comparable across profiles
+def measure_tokens_per_second(batch_size=1, new_tokens=32, repeat=3):
+    from llm_client import load_model
+    import torch
+
+    tokenizer, model = load_model()
+    prompts = [f"Build failed: docker push denied for image {i}. Suggest a mitigation." for i in range(batch_size)]
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+    runs = []
+    with torch.inference_mode():
+        for _ in range(repeat + 1):
+            started = time.perf_counter()
+            outputs = model.generate(
+                inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.eos_token_id
+            )
+            elapsed = time.perf_counter() - started
+            generated = (outputs.shape[-1] - inputs["input_ids"].shape[-1]) * batch_size
+            runs.append(generated / elapsed)
+    # First run is warm-up
+    runs = runs[1:]
+    return {"batch_size": batch_size, "new_tokens": new_tokens,
+            "tokens_per_s": round(sum(runs) / len(runs), 2), "best_tokens_per_s": round(max(runs), 2)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show or benchmark the torch execution profile")
+    parser.add_argument("--profile", choices=PROFILES, default=EXEC_PROFILE)
+    parser.add_argument("--pin", action="store_true", default=PIN_THREADS)
+    parser.add_argument("--bench", action="store_true", help="measure generate() tokens per second")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    profile = apply_profile(args.profile, args.pin)
+    if args.bench:
+        profile.update(measure_tokens_per_second(args.batch_size, args.new_tokens, args.repeat))
+    print(json.dumps(profile))
@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import defaultdict
+from llm_client import MODEL_NAME, MAX_NEW_TOKENS, INFERENCE_TIMEOUT, load_model, generate_batch
+
+SOCKET_PATH = os.getenv("INFERENCE_SOCKET", "/tmp/agent-inference.sock")
+MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+BATCH_WAIT_MS = float(os.getenv("INFERENCE_BATCH_WAIT_MS", "10"))
+MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+
+class _Request:
+    __slots__ = ("prompt", "max_new_tokens", "deadline", "done", "text", "error")
+
+    def __init__(self, prompt, max_new_tokens, timeout):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.deadline = time.monotonic() + timeout
+        self.done = threading.Event()
+        self.text = None
+        self.error = None
+
+    def finish(self, text=None, error=None):
+        self.text = text
+        self.error = error
+        self.done.set()
+
+class InferenceServer:
+    """Hosts GPT-2 once and micro-batches generate requests from concurrent callers."""
+
+    def __init__(self, socket_path=SOCKET_PATH, max_batch=MAX_BATCH, batch_wait_ms=BATCH_WAIT_MS, max_queue=MAX_QUEUE):
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000
+        # Bounded queue: when it is full new requests are rejected as busy instead of piling up
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"requests": 0, "rejected": 0, "timed_out": 0, "batches": 0, "batched_requests": 0}
+        self._stats_lock = threading.Lock()
+        self._server = None
+        self._worker = threading.Thread(target=self._run_batches, name="inference-batcher", daemon=True)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def submit(self, prompt, max_new_tokens=MAX_NEW_TOKENS, timeout=INFERENCE_TIMEOUT):
+        request = _Request(prompt, max_new_tokens, timeout)
+        try:
+            self.queue.put_nowait(request)
+        except queue.Full:
+            self._count("rejected")
+            return {"error": "busy"}
+        self._count("requests")
+        if not request.done.wait(timeout):
+            # The batcher skips requests past their deadline
+            request.deadline = 0
+            self._count("timed_out")
+            return {"error": f"timed out after {timeout}s"}
+        if request.error:
+            return {"error": request.error}
+        return {"text": request.text}
+
+    # Block for the first request, then gather more until the batch is full or the wait window closes
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        window_ends = time.monotonic() + self.batch_wait
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            remaining = window_ends - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batches(self):
+        while True:
+            batch = self._next_batch()
+            stopping = batch[-1] is None
+            now = time.monotonic()
+            groups = defaultdict(list)
+            for request in batch:
+                if request is None:
+                    continue
+                if request.deadline <= now:
+                    request.finish(error="expired in queue")
+                else:
+                    groups[request.max_new_tokens].append(request)
+            # Requests only share a generate call when they ask for the same number of new tokens
+            for max_new_tokens, requests in groups.items():
+                try:
+                    texts = generate_batch([r.prompt for r in requests], max_new_tokens, stage="inference")
+                    for request, text in zip(requests, texts):
+                        request.finish(text=text)
+                except Exception as e:
+                    print(f"Inference batch failed: {str(e)}")
+                    for request in requests:
+                        request.finish(error=str(e))
+                self._count("batches")
+                self._count("batched_requests", len(requests))
+            if stopping:
+                break
+
+    def handle(self, payload):
+        op = payload.get("op", "generate")
+        if op == "ping":
+            with self._stats_lock:
+                stats = dict(self.stats)
+            return {"ok": True, "model": MODEL_NAME, "queued": self.queue.qsize(), "stats": stats}
+        if op == "generate":
+            return self.submit(
+                payload.get("prompt", ""),
+                int(payload.get("max_new_tokens", MAX_NEW_TOKENS)),
+                float(payload.get("timeout", INFERENCE_TIMEOUT)),
+            )
+        return {"error": f"unknown op {op}"}
+
+    def serve_forever(self):
+        load_model()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = _UnixServer(self.socket_path, _Handler)
+        self._server.inference = self
+        self._worker.start()
+        print(f"Inference server for {MODEL_NAME} listening on {self.socket_path} "
+              f"(max batch {self.max_batch}, wait {self.batch_wait * 1000:.0f} ms, queue {self.queue.maxsize})")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+        # Sentinel wakes the batcher so it can exit after the current batch. A full queue is drained
+        # to make room, failing the requests still waiting instead of blocking shutdown.
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                return
+            except queue.Full:
+                pass
+            try:
+                request = self.queue.get_nowait()
+            except queue.Empty:
+                continue
+            if request is not None:
+                request.finish(error="server shutting down")
+
+class _Handler(socketserver.StreamRequestHandler):
+    # One JSON request per line; a connection may send several
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.inference.handle(json.loads(line))
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve GPT-2 generate requests to the agents over a unix socket")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT_MS)
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    args = parser.parse_args()
+    server = InferenceServer(args.socket, args.max_batch, args.batch_wait_ms, args.max_queue)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Inference server stopped")
@@ -0,0 +1,167 @@
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tracing import span
+from execution_profile import apply_profile
+from retrieval_index import context_lines
+
+MODEL_NAME = os.getenv("GPT2_MODEL", "gpt2")
+FORCE_DOWNLOAD = os.getenv("GPT2_FORCE_DOWNLOAD", "0") == "1"
+MAX_NEW_TOKENS = 150
+# Unix socket of a running inference_server.py; when set, agents are thin clients and never load GPT-2
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "60"))
+
+_model_lock = threading.Lock()
+_loaded = None
+_backend = None
+
+# Load GPT-2 once per process; every agent imported into the same interpreter shares it
+def load_model():
+    global _loaded
+    with _model_lock:
+        if _loaded is None:
+            from transformers import GPT2LMHeadModel, GPT2Tokenizer
+            apply_profile()
+            with span("model load", model=MODEL_NAME):
+                tokenizer = GPT2Tokenizer.from_pretrained(MODEL_NAME, force_download=FORCE_DOWNLOAD, clean_up_tokenization_spaces=True)
+                model = GPT2LMHeadModel.from_pretrained(MODEL_NAME, force_download=FORCE_DOWNLOAD)
+            # Left padding keeps each prompt adjacent to its generated tokens in a batch
+            tokenizer.padding_side = "left"
+            tokenizer.pad_token = tokenizer.eos_token
+            _loaded = (tokenizer, model)
+        return _loaded
+
+# Generate one completion per prompt in a single padded batch
+def generate_batch(prompts, max_new_tokens=MAX_NEW_TOKENS, stage=None):
+    tokenizer, model = load_model()
+    with span("llm generate", stage=stage, batch_size=len(prompts)) as record:
+        inputs = tokenizer(prompts, return_tensors="pt", max_length=512, truncation=True, padding=True)
+        outputs = model.generate(
+            inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_new_tokens=max_new_tokens,
+            do_sample=True,
+            pad_token_id=tokenizer.eos_token_id
+        )
+        record["new_tokens"] = int(outputs.shape[-1] - inputs["input_ids"].shape[-1])
+    return [tokenizer.decode(output, skip_special_tokens=True) for output in outputs]
+
+class InferenceError(Exception):
+    pass
+
+class InferenceClient:
+    """Thin client for inference_server.py speaking newline-delimited JSON over a unix socket."""
+
+    def __init__(self, socket_path, timeout=INFERENCE_TIMEOUT, busy_retries=5):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.busy_retries = busy_retries
+
+    def call(self, payload, timeout=None):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            # Leave the server time to report its own timeout before the socket gives up
+            sock.settimeout((timeout or self.timeout) + 5)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        if not line:
+            raise InferenceError("Inference server closed the connection")
+        return json.loads(line)
+
+    def ping(self):
+        return self.call({"op": "ping"}, timeout=5)
+
+    # Retry with backoff while the server sheds load; any other error is raised
+    def generate(self, prompt, max_new_tokens=MAX_NEW_TOKENS, timeout=None):
+        timeout = timeout or self.timeout
+        for attempt in range(self.busy_retries + 1):
+            response = self.call({"op": "generate", "prompt": prompt, "max_new_tokens": max_new_tokens,
+                                  "timeout": timeout}, timeout)
+            if response.get("error") != "busy":
+                break
+            time.sleep(min(0.05 * 2 ** attempt, 2.0))
+        if "error" in response:
+            raise InferenceError(f"Inference server error: {response['error']}")
+        return response["text"]
+
+# Pick the backend once: the inference server when it answers, else the in-process model
+def init_backend():
+    global _backend
+    if _backend is None:
+        if INFERENCE_SOCKET:
+            client = InferenceClient(INFERENCE_SOCKET)
+            try:
+                info = client.ping()
+                print(f"Using inference server at {INFERENCE_SOCKET} (model {info.get('model')})")
+                _backend = client
+                return _backend
+            except (OSError, ValueError, InferenceError) as e:
+                print(f"Inference server at {INFERENCE_SOCKET} unavailable ({str(e)}), loading GPT-2 locally")
+        load_model()
+        _backend = "local"
+    return _backend
+
+def generate_text(prompt, max_new_tokens=MAX_NEW_TOKENS, stage=None):
+    backend = init_backend()
+    if isinstance(backend, InferenceClient):
+        with span("llm generate", stage=stage, backend="server"):
+            return backend.generate(prompt, max_new_tokens)
+    return generate_batch([prompt], max_new_tokens, stage)[0]
+
+# Completions for many prompts through the selected backend: padded batches of batch_size in-process,
+# or concurrent requests the inference server batches itself. A failed batch or request yields None
+# for its prompts, so callers keep every result that did succeed.
+def generate_texts(prompts, max_new_tokens=MAX_NEW_TOKENS, stage=None, batch_size=8):
+    backend = init_backend()
+    if isinstance(backend, InferenceClient):
+        def generate_one(prompt):
+            try:
+                with span("llm generate", stage=stage, backend="server"):
+                    return backend.generate(prompt, max_new_tokens)
+            except (OSError, ValueError, InferenceError) as e:
+                print(f"Generation failed: {str(e)}")
+                return None
+        with ThreadPoolExecutor(max_workers=max(1, min(batch_size, len(prompts)))) as executor:
+            return list(executor.map(generate_one, prompts))
+    responses = []
+    for start in range(0, len(prompts), batch_size):
+        batch = prompts[start:start + batch_size]
+        try:
+            responses.extend(generate_batch(batch, max_new_tokens, stage))
+        except Exception as e:
+            print(f"Generation failed for batch starting at {start}: {str(e)}")
+            responses.extend([None] * len(batch))
+    return responses
+
+# Custom LLM client
+class CustomLLMClient:
+    def __init__(self, stage=None):
+        self.stage = stage
+
+    def create(self, params):
+        try:
+            print("Processing LLM request...")
+            prompt = params.get("prompt", "")
+            # Ground the prompt in the few past issues and mitigations most similar to it
+            context = context_lines(prompt, stage=self.stage)
+            if context:
+                prompt = "Relevant history:\n" + "\n".join(context) + "\n\n" + prompt
+            response_text = generate_text(prompt, stage=self.stage)
+            print(f"LLM response: {response_text}")
+            try:
+                if "```json" in response_text:
+                    json_part = response_text.split("```json")[-1].split("```")[0]
+                    response_json = json.loads(json_part)
+                else:
+                    response_json = {"message": response_text}
+            except Exception:
+                response_json = {"message": response_text}
+            return {"choices": [{"message": {"content": json.dumps(response_json)}}]}
+        except Exception as e:
+            print(f"LLM client error: {str(e)}")
+            return {"choices": [{"message": {"content": json.dumps({"error": str(e)})}}]}
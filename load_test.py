@@ -0,0 +1,196 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_ENDPOINTS = ["/health", "/"]
+
+# Load-test settings, overridable from the environment
+def load_test_config():
+    endpoints = os.getenv("LOAD_TEST_ENDPOINTS", ",".join(DEFAULT_ENDPOINTS))
+    return {
+        "concurrency": int(os.getenv("LOAD_TEST_CONCURRENCY", "8")),
+        "duration": float(os.getenv("LOAD_TEST_DURATION", "10")),
+        "target_rps": float(os.getenv("LOAD_TEST_RPS", "0")),
+        "endpoints": [e.strip() for e in endpoints.split(",") if e.strip()],
+        "timeout": float(os.getenv("LOAD_TEST_TIMEOUT", "10")),
+        "max_p95_ms": float(os.getenv("LOAD_TEST_MAX_P95_MS", "250")),
+        "max_error_rate": float(os.getenv("LOAD_TEST_MAX_ERROR_RATE", "0.01")),
+    }
+
+# One keep-alive session per worker so connections are pooled and reused
+def make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+def latency_stats(latencies_ms):
+    ordered = sorted(latencies_ms)
+    if not ordered:
+        return {"p50": 0.0, "p90": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+    return {
+        "p50": round(percentile(ordered, 50), 3),
+        "p90": round(percentile(ordered, 90), 3),
+        "p95": round(percentile(ordered, 95), 3),
+        "p99": round(percentile(ordered, 99), 3),
+        "max": round(ordered[-1], 3),
+        "mean": round(sum(ordered) / len(ordered), 3),
+    }
+
+class _Pacer:
+    """Hands out request start times so all workers together stay at target_rps."""
+
+    def __init__(self, target_rps, start, deadline):
+        self.interval = 1.0 / target_rps if target_rps > 0 else 0.0
+        self.next_slot = start
+        self.deadline = deadline
+        self.lock = threading.Lock()
+
+    # False when the reserved slot falls at or after the deadline; the worker stops without sleeping
+    def wait(self):
+        if not self.interval:
+            return True
+        with self.lock:
+            slot = self.next_slot
+            self.next_slot += self.interval
+        if slot >= self.deadline:
+            return False
+        delay = slot - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+def run_load_test(base_url, concurrency=8, duration=10.0, target_rps=0.0, endpoints=None, timeout=10.0, keep_samples=False):
+    endpoints = endpoints or DEFAULT_ENDPOINTS
+    base_url = base_url.rstrip("/")
+    start = time.perf_counter()
+    deadline = start + duration
+    pacer = _Pacer(target_rps, start, deadline)
+
+    def worker(index):
+        session = make_session(len(endpoints))
+        records = []
+        i = index
+        try:
+            while True:
+                if not pacer.wait() or time.perf_counter() >= deadline:
+                    break
+                endpoint = endpoints[i % len(endpoints)]
+                i += 1
+                sent = time.perf_counter()
+                try:
+                    response = session.get(base_url + endpoint, timeout=timeout)
+                    response.content
+                    records.append((endpoint, (time.perf_counter() - sent) * 1000, response.status_code, None, sent))
+                except requests.RequestException as e:
+                    records.append((endpoint, (time.perf_counter() - sent) * 1000, None, type(e).__name__, sent))
+        finally:
+            session.close()
+        return records
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, range(concurrency)))
+    # The measured window is the requested duration, extended only by requests still in flight at the
+    # deadline; paced workers stop early once no slot is left, which must not shrink it
+    finished = [sent + latency_ms / 1000 for records in results for _, latency_ms, _, _, sent in records]
+    elapsed = max([deadline] + finished) - start
+
+    per_endpoint = {e: {"latencies": [], "status_codes": {}, "errors": {}} for e in endpoints}
+    for records in results:
+        for endpoint, latency_ms, status, error, _ in records:
+            bucket = per_endpoint[endpoint]
+            if error is not None:
+                bucket["errors"][error] = bucket["errors"].get(error, 0) + 1
+                continue
+            bucket["status_codes"][str(status)] = bucket["status_codes"].get(str(status), 0) + 1
+            if status >= 400:
+                key = f"HTTP {status}"
+                bucket["errors"][key] = bucket["errors"].get(key, 0) + 1
+            else:
+                bucket["latencies"].append(latency_ms)
+
+    report = {
+        "config": {
+            "base_url": base_url,
+            "concurrency": concurrency,
+            "duration_s": duration,
+            "target_rps": target_rps,
+            "endpoints": endpoints,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "endpoints": {},
+    }
+    all_latencies = []
+    total_requests = 0
+    total_errors = 0
+    for endpoint, bucket in per_endpoint.items():
+        errors = sum(bucket["errors"].values())
+        requests_sent = len(bucket["latencies"]) + errors
+        total_requests += requests_sent
+        total_errors += errors
+        all_latencies.extend(bucket["latencies"])
+        report["endpoints"][endpoint] = {
+            "requests": requests_sent,
+            "errors": errors,
+            "error_rate": round(errors / requests_sent, 4) if requests_sent else 0.0,
+            "throughput_rps": round(requests_sent / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": latency_stats(bucket["latencies"]),
+            "status_codes": bucket["status_codes"],
+            "error_breakdown": bucket["errors"],
+        }
+    report["overall"] = {
+        "requests": total_requests,
+        "errors": total_errors,
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": latency_stats(all_latencies),
+    }
+    if keep_samples:
+        report["samples"] = {e: bucket["latencies"] for e, bucket in per_endpoint.items()}
+    return report
+
+# Compare a load-test report with the configured limits and return any violations
+def check_thresholds(report, max_p95_ms, max_error_rate):
+    violations = []
+    for endpoint, stats in report["endpoints"].items():
+        if stats["requests"] == 0:
+            violations.append(f"{endpoint}: no requests completed")
+            continue
+        if stats["latency_ms"]["p95"] > max_p95_ms:
+            violations.append(f"{endpoint}: p95 latency {stats['latency_ms']['p95']:.1f}ms exceeds {max_p95_ms:.1f}ms")
+        if stats["error_rate"] > max_error_rate:
+            violations.append(f"{endpoint}: error rate {stats['error_rate']:.2%} exceeds {max_error_rate:.2%}")
+    return violations
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python load_test.py <base_url>")
+        sys.exit(1)
+    config = load_test_config()
+    result = run_load_test(
+        sys.argv[1],
+        concurrency=config["concurrency"],
+        duration=config["duration"],
+        target_rps=config["target_rps"],
+        endpoints=config["endpoints"],
+        timeout=config["timeout"],
+    )
+    print(json.dumps(result, indent=2))
+    violations = check_thresholds(result, config["max_p95_ms"], config["max_error_rate"])
+    for violation in violations:
+        print(f"Threshold violation: {violation}")
+    sys.exit(1 if violations else 0)
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from log_templates import TemplateMiner
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "1"))
+# Shards per worker, so uneven shards still balance across the pool
+SHARDS_PER_WORKER = 4
+# Log-spaced response time buckets from 0.1 ms to 100 s, 100 per decade; counts add up across shards
+LATENCY_EDGES = np.geomspace(1e-4, 100.0, 601)
+
+# Vectorized mock logs, one request per minute from start_time
+def mock_log_frame(rows, start_time, rng):
+    return pd.DataFrame({
+        "timestamp": pd.date_range(start_time, periods=rows, freq="min"),
+        "response_time": rng.exponential(0.1, rows),
+        "status": pd.Categorical.from_codes((rng.random(rows) <= 0.1).astype(np.int8), ["success", "failed"]),
+    })
+
+@dataclass(slots=True)
+class LogStats:
+    """Mergeable aggregate of a slice of request logs."""
+
+    requests: int = 0
+    successes: int = 0
+    response_time_sum: float = 0.0
+    response_time_min: float = float("inf")
+    response_time_max: float = 0.0
+    latency_counts: np.ndarray = field(default_factory=lambda: np.zeros(len(LATENCY_EDGES) + 1, dtype=np.int64))
+    first_timestamp: object = None
+    last_timestamp: object = None
+
+    @classmethod
+    def from_frame(cls, df):
+        stats = cls()
+        if df.empty:
+            return stats
+        response_time = df["response_time"].to_numpy()
+        stats.requests = len(df)
+        stats.successes = int((df["status"] == "success").sum())
+        stats.response_time_sum = float(response_time.sum())
+        stats.response_time_min = float(response_time.min())
+        stats.response_time_max = float(response_time.max())
+        stats.latency_counts = np.bincount(np.searchsorted(LATENCY_EDGES, response_time), minlength=len(LATENCY_EDGES) + 1)
+        stats.first_timestamp = df["timestamp"].min()
+        stats.last_timestamp = df["timestamp"].max()
+        return stats
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.successes += other.successes
+        self.response_time_sum += other.response_time_sum
+        self.response_time_min = min(self.response_time_min, other.response_time_min)
+        self.response_time_max = max(self.response_time_max, other.response_time_max)
+        self.latency_counts = self.latency_counts + other.latency_counts
+        for name, pick in (("first_timestamp", min), ("last_timestamp", max)):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            setattr(self, name, theirs if mine is None else mine if theirs is None else pick(mine, theirs))
+        return self
+
+    # Linear interpolation inside the bucket holding the q-th quantile, clamped to the observed range
+    def quantile(self, q):
+        if not self.requests:
+            return 0.0
+        cumulative = np.cumsum(self.latency_counts)
+        target = q * self.requests
+        index = int(np.searchsorted(cumulative, target))
+        lower = LATENCY_EDGES[index - 1] if index > 0 else self.response_time_min
+        upper = LATENCY_EDGES[index] if index < len(LATENCY_EDGES) else self.response_time_max
+        below = cumulative[index - 1] if index > 0 else 0
+        fraction = (target - below) / self.latency_counts[index]
+        value = lower + fraction * (upper - lower)
+        return float(min(max(value, self.response_time_min), self.response_time_max))
+
+    def summary(self):
+        return {
+            "total_requests": self.requests,
+            "success_rate": self.successes / self.requests if self.requests else 0.0,
+            "avg_response_time": self.response_time_sum / self.requests if self.requests else 0.0,
+            "p95_response_time": self.quantile(0.95),
+            "first_timestamp": str(self.first_timestamp),
+            "last_timestamp": str(self.last_timestamp),
+        }
+
+# Contiguous time ranges: (offset in minutes, rows) per shard
+def time_shards(rows, shards):
+    shards = max(1, min(shards, rows))
+    bounds = np.linspace(0, rows, shards + 1).astype(int)
+    return [(int(start), int(end - start)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+def analyze_shard(start_time, offset, rows, seed):
+    df = mock_log_frame(rows, start_time + pd.Timedelta(minutes=offset), np.random.default_rng(seed))
+    return LogStats.from_frame(df)
+
+def mine_shard(path):
+    miner = TemplateMiner()
+    with open(path, "r", errors="replace") as f:
+        miner.add_lines(f)
+    # The exact-line cache is only useful while mining; keep it out of the pickle back to the parent
+    miner._exact = {}
+    return miner
+
+# Fork keeps workers from re-running the agent module (and loading GPT-2) on import
+def _pool(workers):
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork") if "fork" in methods else None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+# Split the time range across a process pool and reduce the per-shard statistics
+def analyze_sharded(rows, start_time, workers=ANALYSIS_WORKERS, seed=None):
+    shards = time_shards(rows, workers * SHARDS_PER_WORKER)
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    stats = LogStats()
+    with _pool(workers) as executor:
+        futures = [executor.submit(analyze_shard, start_time, offset, count, s) for (offset, count), s in zip(shards, seeds)]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+# One file per task; templates from every shard are merged into a single miner
+def mine_files_sharded(paths, workers=ANALYSIS_WORKERS):
+    merged = TemplateMiner()
+    with _pool(workers) as executor:
+        for miner in executor.map(mine_shard, paths):
+            merged.merge(miner)
+    return merged
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import re
+from collections import Counter
+
+SIMILARITY = float(os.getenv("LOG_TEMPLATE_SIMILARITY", "0.5"))
+WILDCARD = "<*>"
+# Health, readiness and metrics probes dominate access logs and say nothing about behaviour
+DEFAULT_NOISE_PATTERNS = [
+    r'"(?:GET|HEAD) /(?:health|healthz|ready|readyz|live|livez|metrics)\b',
+    r"kube-probe/",
+]
+NOISE_PATTERNS = [p for p in os.getenv("LOG_NOISE_PATTERNS", "").split(",") if p] or DEFAULT_NOISE_PATTERNS
+
+# Variable fields masked before clustering, most specific first
+MASKS = [
+    (re.compile(r"\[\d{1,2}/\w{3}/\d{4}[ :]\d{2}:\d{2}:\d{2}[^\]]*\]"), "<TS>"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<TS>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I), "<UUID>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<IP>"),
+    (re.compile(r"\b(?:sha256:)?[0-9a-f]{12,}\b"), "<HEX>"),
+    # HTTP status codes after the quoted request line are kept, they separate templates
+    (re.compile(r"(?<![\w.])(?<!\" )[-+]?\d+(?:\.\d+)?(?:ms|s|m|h|Mi|Gi|%)?\b"), "<NUM>"),
+]
+MAX_EXACT_CACHE = 100_000
+
+def mask(line):
+    for pattern, replacement in MASKS:
+        line = pattern.sub(replacement, line)
+    return line
+
+class LogTemplate:
+    __slots__ = ("id", "tokens", "count", "example")
+
+    def __init__(self, template_id, tokens, example):
+        self.id = template_id
+        self.tokens = tokens
+        self.count = 0
+        self.example = example
+
+    @property
+    def template(self):
+        return " ".join(self.tokens)
+
+    # Share of positions that match exactly; wildcard positions never count as matches
+    def similarity(self, tokens):
+        same = sum(1 for a, b in zip(self.tokens, tokens) if a == b and a != WILDCARD)
+        return same / len(tokens)
+
+    def absorb(self, tokens):
+        self.tokens = [a if a == b else WILDCARD for a, b in zip(self.tokens, tokens)]
+
+    def to_dict(self):
+        return {"id": self.id, "template": self.template, "count": self.count, "example": self.example}
+
+class TemplateMiner:
+    """Streaming Drain-style log clustering: lines are masked, bucketed by token count, first
+    token and status codes, then merged into the most similar template in the bucket."""
+
+    def __init__(self, similarity=SIMILARITY, noise_patterns=None):
+        self.threshold = similarity
+        self.noise = [re.compile(p) for p in (NOISE_PATTERNS if noise_patterns is None else noise_patterns)]
+        self.noise_counts = Counter()
+        self.lines = 0
+        self.clusters = []
+        self._buckets = {}
+        # Exact masked lines already seen skip the similarity search entirely
+        self._exact = {}
+
+    # Token count, first token and any status codes, so 200s and 500s never share a template
+    def _bucket_key(self, tokens):
+        first = tokens[0]
+        if any(c.isdigit() for c in first) or first.startswith("<"):
+            first = WILDCARD
+        return len(tokens), first, tuple(t for t in tokens if t.isdigit())
+
+    # Returns the template the line joined, or None for blank lines and probe noise
+    def add(self, line):
+        line = line.rstrip("\n")
+        if not line.strip():
+            return None
+        self.lines += 1
+        for pattern in self.noise:
+            if pattern.search(line):
+                self.noise_counts[pattern.pattern] += 1
+                return None
+        masked = mask(line)
+        cluster = self._exact.get(masked)
+        if cluster is None:
+            cluster = self._place(masked.split(), line[:300])
+            if len(self._exact) < MAX_EXACT_CACHE:
+                self._exact[masked] = cluster
+        cluster.count += 1
+        return cluster
+
+    # Merge tokens into the most similar template in their bucket, or start a new one
+    def _place(self, tokens, example):
+        bucket = self._buckets.setdefault(self._bucket_key(tokens), [])
+        best, best_score = None, -1.0
+        for candidate in bucket:
+            score = candidate.similarity(tokens)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best is not None and best_score >= self.threshold:
+            best.absorb(tokens)
+            return best
+        cluster = LogTemplate(len(self.clusters), tokens, example)
+        self.clusters.append(cluster)
+        bucket.append(cluster)
+        return cluster
+
+    # Fold another miner's templates and counters into this one, e.g. to reduce sharded mining
+    def merge(self, other):
+        self.lines += other.lines
+        self.noise_counts.update(other.noise_counts)
+        for cluster in other.clusters:
+            self._place(list(cluster.tokens), cluster.example).count += cluster.count
+        return self
+
+    def add_lines(self, lines):
+        for line in lines:
+            self.add(line)
+        return self
+
+    def templates(self, limit=None):
+        ranked = sorted(self.clusters, key=lambda c: c.count, reverse=True)
+        return [c.to_dict() for c in ranked[:limit]]
+
+    def summary(self, limit=20):
+        noise = sum(self.noise_counts.values())
+        return {
+            "lines": self.lines,
+            "noise_dropped": noise,
+            "noise_by_pattern": dict(self.noise_counts),
+            "templates": len(self.clusters),
+            "compression": round(self.lines / len(self.clusters), 1) if self.clusters else 0.0,
+            "top": self.templates(limit),
+        }
+
+    # Compact "count x template" lines for LLM prompts and reports
+    def compact(self, limit=20):
+        return "\n".join(f"{t['count']}x {t['template']}" for t in self.templates(limit))
+
+# Stream every line of the given files through one miner without holding them in memory
+def mine_files(paths, miner=None):
+    miner = miner or TemplateMiner()
+    for path in paths:
+        with open(path, "r", errors="replace") as f:
+            miner.add_lines(f)
+    return miner
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster log lines into templates and drop probe noise")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    miner = mine_files(args.paths)
+    if args.json:
+        print(json.dumps(miner.summary(args.limit), indent=2))
+    else:
+        summary = miner.summary(args.limit)
+        print(f"{summary['lines']} lines, {summary['noise_dropped']} probe lines dropped, {summary['templates']} templates")
+        print(miner.compact(args.limit))
@@ -0,0 +1,117 @@
+import json
+import os
+import random
+import sqlite3
+from datetime import datetime
+import numpy as np
+
+DB_PATH = os.getenv("PERF_BASELINE_DB", "perf_baseline.db")
+MAX_STORED_SAMPLES = 2000
+BOOTSTRAP_ITERATIONS = int(os.getenv("PERF_BOOTSTRAP_ITERATIONS", "1000"))
+CONFIDENCE = float(os.getenv("PERF_CONFIDENCE", "0.95"))
+# Relative p95 change below this is treated as noise even when the interval excludes zero
+MIN_EFFECT = float(os.getenv("PERF_MIN_EFFECT", "0.05"))
+# Set to 1 to accept an intentional slowdown as the new baseline
+ACCEPT_REGRESSION = os.getenv("PERF_ACCEPT_REGRESSION", "0") == "1"
+
+def init_db(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS perf_baseline
+                    (endpoint TEXT, image_tag TEXT, timestamp TEXT, p95 REAL, samples TEXT)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_perf_baseline_key
+                    ON perf_baseline (endpoint, image_tag, timestamp)''')
+
+# Most recent stored latency samples for an endpoint and image tag
+def load_baseline(endpoint, image_tag, db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    try:
+        init_db(conn)
+        row = conn.execute(
+            "SELECT samples FROM perf_baseline WHERE endpoint = ? AND image_tag = ? ORDER BY timestamp DESC LIMIT 1",
+            (endpoint, image_tag)
+        ).fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+# Uniform subsample, so stored baselines and the bootstrap both stay bounded
+def cap_samples(samples, limit=MAX_STORED_SAMPLES):
+    samples = list(samples)
+    return random.sample(samples, limit) if len(samples) > limit else samples
+
+def store_baseline(samples_by_endpoint, image_tag, db_path=DB_PATH):
+    timestamp = datetime.now().isoformat()
+    rows = []
+    for endpoint, samples in samples_by_endpoint.items():
+        if not samples:
+            continue
+        samples = cap_samples(samples)
+        p95 = float(np.percentile(samples, 95))
+        rows.append((endpoint, image_tag, timestamp, p95, json.dumps([round(v, 3) for v in samples])))
+    conn = sqlite3.connect(db_path)
+    try:
+        init_db(conn)
+        with conn:
+            conn.executemany("INSERT INTO perf_baseline VALUES (?, ?, ?, ?, ?)", rows)
+    finally:
+        conn.close()
+
+# Bootstrap confidence interval for the difference in p95 latency (current - baseline)
+def bootstrap_p95_delta(baseline, current, iterations=BOOTSTRAP_ITERATIONS, confidence=CONFIDENCE, seed=0):
+    rng = np.random.default_rng(seed)
+    baseline = np.asarray(baseline, dtype=float)
+    current = np.asarray(current, dtype=float)
+    baseline_p95 = np.percentile(rng.choice(baseline, (iterations, baseline.size)), 95, axis=1)
+    current_p95 = np.percentile(rng.choice(current, (iterations, current.size)), 95, axis=1)
+    deltas = current_p95 - baseline_p95
+    alpha = (1 - confidence) / 2
+    return float(np.quantile(deltas, alpha)), float(np.quantile(deltas, 1 - alpha))
+
+def compare_to_baseline(baseline, current):
+    baseline_p95 = float(np.percentile(baseline, 95))
+    current_p95 = float(np.percentile(current, 95))
+    delta = current_p95 - baseline_p95
+    ci_low, ci_high = bootstrap_p95_delta(baseline, current)
+    relative = delta / baseline_p95 if baseline_p95 else 0.0
+    if ci_low > 0 and relative > MIN_EFFECT:
+        verdict = "regress"
+    elif ci_high < 0 and relative < -MIN_EFFECT:
+        verdict = "improve"
+    else:
+        verdict = "pass"
+    return {
+        "verdict": verdict,
+        "baseline_p95_ms": round(baseline_p95, 3),
+        "current_p95_ms": round(current_p95, 3),
+        "delta_ms": round(delta, 3),
+        "delta_pct": round(relative * 100, 2),
+        "ci_ms": [round(ci_low, 3), round(ci_high, 3)],
+        "baseline_samples": len(baseline),
+        "current_samples": len(current),
+    }
+
+# Compare every endpoint against its baseline, then record this run as the new baseline.
+# A regressed run is not stored, so the baseline stays pinned until a run passes or is accepted.
+def evaluate_run(samples_by_endpoint, image_tag, baseline_tag=None, db_path=DB_PATH, accept=ACCEPT_REGRESSION):
+    baseline_tag = baseline_tag or image_tag
+    samples_by_endpoint = {endpoint: cap_samples(samples) for endpoint, samples in samples_by_endpoint.items()}
+    endpoints = {}
+    for endpoint, samples in samples_by_endpoint.items():
+        baseline = load_baseline(endpoint, baseline_tag, db_path)
+        if not baseline or not samples:
+            endpoints[endpoint] = {"verdict": "no-baseline"}
+            continue
+        endpoints[endpoint] = compare_to_baseline(baseline, samples)
+    verdicts = {result["verdict"] for result in endpoints.values()}
+    if "regress" in verdicts:
+        verdict = "regress"
+    elif "improve" in verdicts:
+        verdict = "improve"
+    elif "pass" in verdicts:
+        verdict = "pass"
+    else:
+        verdict = "no-baseline"
+    stored = verdict != "regress" or accept
+    if stored:
+        store_baseline(samples_by_endpoint, image_tag, db_path)
+    return {"verdict": verdict, "image_tag": image_tag, "baseline_tag": baseline_tag, "baseline_updated": stored,
+            "endpoints": endpoints}
@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import requests
+# Importing the agents loads GPT-2 once; llm_client shares it across all of them
+from build_agent import build_and_push_docker
+from deploy_agent import deploy_to_kubernetes
+from test_agent import test_application, test_image
+from autogen_log_analysis import analyze_logs
+from tracing import span
+from command_runner import run_command
+from reports import Report
+
+# Debug: Print Python version and file path
+print(f"Python version: {sys.version}")
+print(f"Running pipeline.py from: {os.path.abspath(__file__)}")
+
+MAX_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+CONTAINER_READY_TIMEOUT = int(os.getenv("CONTAINER_READY_TIMEOUT", "90"))
+
+# Run the image under test locally for the duration of the test stage
+def run_test_stage(results):
+    container_id = None
+    try:
+        result = run_command(
+            ["docker", "run", "-d", "--rm", "-p", "5000:5000", test_image]
+        )
+        if result.returncode == 0:
+            container_id = result.stdout.strip()
+            wait_for_health("http://localhost:5000/health", CONTAINER_READY_TIMEOUT)
+        else:
+            print(f"Failed to start test container: {result.stderr}")
+        return test_application(None)
+    finally:
+        if container_id:
+            run_command(["docker", "stop", container_id])
+
+# Poll /health instead of sleeping a fixed 90 s like the CI job does
+def wait_for_health(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    print(f"{url} not healthy after {timeout}s")
+    return False
+
+def run_analysis_stage(results):
+    reports = {f"{name}_report.json": results[name] for name in ("build", "test", "deploy") if name in results}
+    return analyze_logs(None, reports=reports)
+
+# name: (dependencies, stage function taking the results gathered so far)
+STAGES = {
+    "build": ([], lambda results: build_and_push_docker(None)),
+    "deploy": (["build"], lambda results: deploy_to_kubernetes(None)),
+    "test": (["build"], run_test_stage),
+    "analyze": (["build", "deploy", "test"], run_analysis_stage),
+}
+
+def run_stage(name, func, results):
+    started = time.perf_counter()
+    print(f"[pipeline] Starting {name}")
+    try:
+        with span(f"stage {name}", stage=name):
+            result = json.loads(func(results))
+    except Exception as e:
+        print(f"[pipeline] {name} raised: {str(e)}")
+        result = Report.failed(name, f"{name} stage raised: {str(e)}", "Check the stage logs").to_dict()
+    elapsed = time.perf_counter() - started
+    print(f"[pipeline] Finished {name} in {elapsed:.2f}s with status {result.get('status')}")
+    return result, elapsed
+
+# Run stages as soon as their dependencies finish, overlapping independent ones in a thread pool
+def run_pipeline(stages=STAGES, max_workers=MAX_WORKERS):
+    started = time.perf_counter()
+    results = {}
+    timings = {}
+    pending = dict(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, (deps, func) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    del pending[name]
+                    running[executor.submit(run_stage, name, func, dict(results))] = name
+            if not running:
+                raise RuntimeError(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], timings[name] = future.result()
+    total = time.perf_counter() - started
+    summary = {
+        "status": "success" if all(r.get("status") == "success" for r in results.values()) else "failed",
+        "stages": {name: results[name].get("status") for name in stages},
+        "timings": {name: round(timings[name], 3) for name in stages},
+        "total_s": round(total, 3),
+    }
+    print(json.dumps(summary, indent=2))
+    return summary
+
+if __name__ == "__main__":
+    summary = run_pipeline()
+    exit(0 if summary["status"] == "success" else 1)
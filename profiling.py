@@ -0,0 +1,110 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+TOP_HOTSPOTS = 15
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+
+# Profiling mode from --profile[=cprofile|sample] or AGENT_PROFILE; None when disabled
+def profile_mode(argv=None):
+    for arg in argv if argv is not None else sys.argv[1:]:
+        if arg == "--profile":
+            return "cprofile"
+        if arg.startswith("--profile="):
+            return arg.split("=", 1)[1]
+    mode = os.getenv("AGENT_PROFILE", "").strip().lower()
+    return mode or None
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and aggregates collapsed stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def hotspots(self, limit=TOP_HOTSPOTS):
+        total = sum(self.stacks.values())
+        self_counts = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack.rsplit(";", 1)[-1]] += count
+        return [
+            {"function": function, "samples": count, "share": round(count / total, 4)}
+            for function, count in self_counts.most_common(limit)
+        ]
+
+def _cprofile_hotspots(stats, limit=TOP_HOTSPOTS):
+    entries = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        entries.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "tottime_s": round(tottime, 6),
+            "cumtime_s": round(cumtime, 6),
+        })
+    entries.sort(key=lambda e: e["tottime_s"], reverse=True)
+    return entries[:limit]
+
+# Run func under the selected profiler and write <name>_profile.* next to the reports
+def run_profiled(name, func, *args, mode=None, **kwargs):
+    mode = mode if mode is not None else profile_mode()
+    if not mode:
+        return func(*args, **kwargs)
+    started = time.perf_counter()
+    if mode == "sample":
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.stop()
+            with open(f"{name}_profile.collapsed", "w") as f:
+                for stack, count in profiler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            _write_summary(name, mode, time.perf_counter() - started, profiler.hotspots(), f"{name}_profile.collapsed")
+    if mode != "cprofile":
+        print(f"Unknown profile mode {mode}, falling back to cprofile")
+        mode = "cprofile"
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(f"{name}_profile.pstats")
+        stats = pstats.Stats(profiler)
+        _write_summary(name, mode, time.perf_counter() - started, _cprofile_hotspots(stats), f"{name}_profile.pstats")
+
+def _write_summary(name, mode, elapsed, hotspots, output):
+    summary = {"agent": name, "mode": mode, "elapsed_s": round(elapsed, 3), "output": output, "hotspots": hotspots}
+    try:
+        with open(f"{name}_profile.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Wrote {name}_profile.json and {output}")
+    except Exception as e:
+        print(f"Failed to write {name}_profile.json: {str(e)}")
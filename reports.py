@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import zlib
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from tracing import spans
+from retrieval_index import index_report
+
+SCHEMA_VERSION = 1
+MAX_ISSUES = int(os.getenv("REPORT_MAX_ISSUES", "20"))
+MAX_ISSUE_CHARS = int(os.getenv("REPORT_MAX_ISSUE_CHARS", "400"))
+# History rows are compact JSON text ("json") or zlib-compressed JSON bytes ("zlib")
+HISTORY_ENCODING = os.getenv("REPORT_HISTORY_ENCODING", "json")
+# Read once at import: os.umask can only be queried by setting it, which is not thread-safe later
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# Keep the start and the end of long messages; the end of stderr usually holds the actual error
+def truncate(message, limit=MAX_ISSUE_CHARS):
+    message = str(message).strip()
+    if len(message) <= limit:
+        return message
+    head = limit // 4
+    tail = limit - head
+    return f"{message[:head]} ... [{len(message) - limit} chars truncated] ... {message[-tail:]}"
+
+@dataclass(slots=True)
+class Report:
+    """Result of one pipeline stage, written once per run to <stage>_report.json."""
+
+    stage: str
+    status: str = "unknown"
+    issues: list = field(default_factory=list)
+    mitigations: list = field(default_factory=list)
+    dropped_issues: int = 0
+    timings: dict = field(default_factory=dict)
+    spans: list = field(default_factory=list)
+    details: dict = field(default_factory=dict)
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    schema_version: int = SCHEMA_VERSION
+
+    @classmethod
+    def failed(cls, stage, issue, mitigation=None, **details):
+        report = cls(stage, details=details)
+        report.fail(issue, mitigation)
+        return report
+
+    # Issues beyond MAX_ISSUES are only counted, so a failure loop cannot grow the report unbounded
+    def add_issue(self, issue, mitigation=None):
+        if len(self.issues) < MAX_ISSUES:
+            self.issues.append(truncate(issue))
+        else:
+            self.dropped_issues += 1
+        if mitigation:
+            self.add_mitigation(mitigation)
+
+    def add_mitigation(self, mitigation):
+        if mitigation not in self.mitigations:
+            self.mitigations.append(mitigation)
+
+    def fail(self, issue, mitigation=None):
+        self.status = "failed"
+        self.add_issue(issue, mitigation)
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_json(self, indent=None):
+        separators = None if indent else (",", ":")
+        return json.dumps(self.to_dict(), indent=indent, separators=separators, default=str)
+
+    # Accepts both schema reports and the older flat summaries; unknown keys land in details
+    @classmethod
+    def from_dict(cls, data, stage="unknown"):
+        names = {f.name for f in fields(cls)}
+        known = {k: v for k, v in data.items() if k in names and k != "details"}
+        known.setdefault("stage", stage)
+        report = cls(**known)
+        report.details = dict(data.get("details", {}))
+        report.details.update({k: v for k, v in data.items() if k not in names})
+        return report
+
+    @classmethod
+    def from_json(cls, text, stage="unknown"):
+        return cls.from_dict(json.loads(text), stage)
+
+# The single write path: attach the stage's spans and replace the report file atomically
+def write_report(report, path=None):
+    path = path or f"{report.stage}_report.json"
+    report.spans = spans(report.stage)
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=".report-", suffix=".json", dir=directory)
+        try:
+            # mkstemp creates the file 0600; give it the mode a plain open() would have
+            os.fchmod(fd, 0o666 & ~UMASK)
+            with os.fdopen(fd, "w") as f:
+                f.write(report.to_json())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        print(f"Wrote {os.path.abspath(path)} ({report.status})")
+    except Exception as e:
+        print(f"Failed to write {path}: {str(e)}")
+        return False
+    # Keep the retrieval index current as each run completes
+    try:
+        index_report(report)
+    except Exception as e:
+        print(f"Failed to index {path}: {str(e)}")
+    return True
+
+def encode_history(report, encoding=HISTORY_ENCODING):
+    text = report.to_json()
+    if encoding == "zlib":
+        return zlib.compress(text.encode(), 6)
+    return text
+
+def decode_history(value):
+    if isinstance(value, bytes):
+        value = zlib.decompress(value).decode()
+    return Report.from_json(value)
@@ -0,0 +1,138 @@
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+from collections import Counter
+
+DB_PATH = os.getenv("REPORT_INDEX_DB", "report_index.db")
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "check", "for", "from", "in", "is", "it",
+    "no", "not", "of", "on", "or", "the", "to", "was", "with",
+}
+TOKEN_RE = re.compile(r"[a-z][a-z0-9_.-]*[a-z0-9]|[a-z]")
+
+# Lowercased words; numbers, digests and stopwords carry no signal between runs
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and not re.fullmatch(r"[0-9a-f]{12,}", t)]
+
+def init_db(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS snippets (
+            id INTEGER PRIMARY KEY, stage TEXT, kind TEXT, text TEXT, length INTEGER,
+            occurrences INTEGER DEFAULT 1, last_seen TEXT, UNIQUE (stage, kind, text));
+        CREATE TABLE IF NOT EXISTS postings (term TEXT, snippet_id INTEGER, tf INTEGER);
+        CREATE INDEX IF NOT EXISTS idx_postings_term ON postings (term);
+        CREATE TABLE IF NOT EXISTS indexed_snippets (
+            stage TEXT, created_at TEXT, kind TEXT, text TEXT, PRIMARY KEY (stage, created_at, kind, text));
+    ''')
+    conn.commit()
+    return conn
+
+# Add one report's issues and mitigations. Each is keyed by the report it came from, so indexing
+# a report again only adds what was appended since, e.g. a chat failure recorded after the stage ran.
+# A snippet seen before only bumps its occurrence count, so the index grows with distinct problems.
+def index_report(report, db_path=DB_PATH):
+    conn = init_db(db_path)
+    try:
+        with conn:
+            added = 0
+            for kind, texts in (("issue", report.issues), ("mitigation", report.mitigations)):
+                for text in texts:
+                    terms = Counter(tokenize(text))
+                    if not terms:
+                        continue
+                    seen = conn.execute("INSERT OR IGNORE INTO indexed_snippets VALUES (?, ?, ?, ?)",
+                                        (report.stage, report.created_at, kind, text))
+                    if seen.rowcount == 0:
+                        continue
+                    cursor = conn.execute(
+                        "UPDATE snippets SET occurrences = occurrences + 1, last_seen = ? WHERE stage = ? AND kind = ? AND text = ?",
+                        (report.created_at, report.stage, kind, text)
+                    )
+                    if cursor.rowcount:
+                        continue
+                    snippet_id = conn.execute(
+                        "INSERT INTO snippets (stage, kind, text, length, last_seen) VALUES (?, ?, ?, ?, ?)",
+                        (report.stage, kind, text, sum(terms.values()), report.created_at)
+                    ).lastrowid
+                    conn.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                                     ((term, snippet_id, tf) for term, tf in terms.items()))
+                    added += 1
+            return added
+    finally:
+        conn.close()
+
+# BM25 over the snippets, optionally restricted to one stage; returns the top k with their scores
+def search(query, k=TOP_K, stage=None, db_path=DB_PATH):
+    if not os.path.exists(db_path):
+        return []
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+    conn = sqlite3.connect(db_path)
+    try:
+        where, params = ("WHERE stage = ?", (stage,)) if stage else ("", ())
+        total, avg_length = conn.execute(f"SELECT COUNT(*), AVG(length) FROM snippets {where}", params).fetchone()
+        if not total:
+            return []
+        scores = Counter()
+        for term in terms:
+            rows = conn.execute(
+                f"SELECT p.snippet_id, p.tf, s.length FROM postings p JOIN snippets s ON s.id = p.snippet_id "
+                f"WHERE p.term = ? {'AND s.stage = ?' if stage else ''}",
+                (term,) + params
+            ).fetchall()
+            if not rows:
+                continue
+            idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+            for snippet_id, tf, length in rows:
+                scores[snippet_id] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_length))
+        results = []
+        for snippet_id, score in scores.most_common(k):
+            stage_name, kind, text, occurrences, last_seen = conn.execute(
+                "SELECT stage, kind, text, occurrences, last_seen FROM snippets WHERE id = ?", (snippet_id,)
+            ).fetchone()
+            results.append({"stage": stage_name, "kind": kind, "text": text, "occurrences": occurrences,
+                            "last_seen": last_seen, "score": round(score, 4)})
+        return results
+    finally:
+        conn.close()
+
+# Top-k snippets as short prompt lines; empty when there is no history yet
+def context_lines(query, k=TOP_K, stage=None, db_path=DB_PATH):
+    hits = search(query, k, stage, db_path)
+    if not hits and stage:
+        hits = search(query, k, None, db_path)
+    return [f"- [{hit['stage']} {hit['kind']} x{hit['occurrences']}] {hit['text']}" for hit in hits]
+
+if __name__ == "__main__":
+    from reports import Report
+
+    parser = argparse.ArgumentParser(description="Index report issues and mitigations, or query the index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    add = subcommands.add_parser("add", help="index <stage>_report.json files")
+    add.add_argument("paths", nargs="+")
+    query = subcommands.add_parser("query")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=TOP_K)
+    query.add_argument("--stage")
+    args = parser.parse_args()
+    if args.command == "add":
+        for path in args.paths:
+            if not os.path.exists(path):
+                print(f"{path} not found")
+                continue
+            stage = os.path.basename(path).split("_report.json")[0]
+            with open(path, "r") as f:
+                report = Report.from_json(f.read(), stage)
+            print(f"Indexed {index_report(report)} new snippet(s) from {path}")
+    else:
+        print(json.dumps(search(args.text, args.k, args.stage), indent=2))
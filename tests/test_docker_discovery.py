@@ -0,0 +1,78 @@
+import os
+import stat
+import pytest
+import docker_discovery
+from docker_discovery import ContainerDiscovery, DiscoveryError, DockerClient
+from fixtures import StubDockerDaemon
+
+IMAGE = "ghcr.io/ravitejareddy123/myimage:latest"
+
+CONTAINERS = [{
+    "Id": "c0ffee" * 10,
+    "Image": IMAGE,
+    "NetworkSettings": {"Networks": {"bridge": {"IPAddress": "172.17.0.2"}}},
+    "Ports": [{"PrivatePort": 5000, "PublicPort": 32768}],
+}]
+
+KIND_NODES = [{
+    "Id": "feed" * 16,
+    "NetworkSettings": {"Networks": {"kind": {"IPAddress": "172.18.0.2"}}},
+}]
+
+@pytest.fixture
+def daemon(tmp_path):
+    with StubDockerDaemon(str(tmp_path), containers=CONTAINERS) as stub:
+        yield stub
+
+@pytest.fixture
+def discovery(daemon):
+    discovery = ContainerDiscovery(DockerClient(daemon.socket_path))
+    yield discovery
+    discovery.close()
+
+# Replace kubectl on PATH with a shell script
+def stub_kubectl(tmp_path, monkeypatch, body):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    path = bin_dir / "kubectl"
+    path.write_text(f"#!/bin/sh\n{body}\n")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ.get("PATH", ""))
+
+def test_container_url_uses_bridge_ip(discovery):
+    assert discovery.container_url(IMAGE) == "http://172.17.0.2:5000"
+
+def test_container_url_is_cached(daemon, discovery):
+    discovery.container_url(IMAGE)
+    requests = daemon.requests
+    assert discovery.container_url(IMAGE) == "http://172.17.0.2:5000"
+    assert daemon.requests == requests
+
+def test_container_url_without_container(daemon, discovery):
+    daemon.containers = []
+    with pytest.raises(DiscoveryError):
+        discovery.container_url(IMAGE)
+
+def test_request_reconnects_after_idle_connection_is_dropped(daemon):
+    client = DockerClient(daemon.socket_path)
+    try:
+        assert client.get("/containers/json") == CONTAINERS
+        daemon.drop_connections()
+        assert client.get("/containers/json") == CONTAINERS
+        assert daemon.requests == 2
+    finally:
+        client.close_connection()
+
+def test_service_url_uses_node_port(tmp_path, monkeypatch, daemon, discovery):
+    stub_kubectl(tmp_path, monkeypatch, """echo '{"spec": {"ports": [{"port": 80, "nodePort": 30080}]}}'""")
+    daemon.containers = KIND_NODES
+    assert discovery.service_url("microservice-profile") == "http://172.18.0.2:30080"
+
+def test_port_forward_times_out_when_kubectl_is_silent(tmp_path, monkeypatch, discovery):
+    stub_kubectl(tmp_path, monkeypatch, """case "$1" in
+  get) echo '{"spec": {"ports": [{"port": 80}]}}' ;;
+  port-forward) exec sleep 30 ;;
+esac""")
+    monkeypatch.setattr(docker_discovery, "PORT_FORWARD_TIMEOUT", 0.5)
+    with pytest.raises(DiscoveryError, match="printed nothing"):
+        discovery.service_url("microservice-service")
@@ -0,0 +1,67 @@
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Oldest spans are dropped first, so long-running processes such as inference_server.py stay bounded
+MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "10000"))
+_spans = deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+# Record wall time, CPU time of the calling thread and process peak RSS for a block
+@contextmanager
+def span(name, stage=None, **attrs):
+    start = time.perf_counter()
+    start_cpu = time.thread_time()
+    record = {"name": name, "stage": stage}
+    record.update(attrs)
+    try:
+        yield record
+    finally:
+        end = time.perf_counter()
+        record["start_ms"] = round((start - _origin) * 1000, 3)
+        record["wall_ms"] = round((end - start) * 1000, 3)
+        record["cpu_ms"] = round((time.thread_time() - start_cpu) * 1000, 3)
+        record["peak_rss_mb"] = peak_rss_mb()
+        record["thread"] = threading.get_ident()
+        with _lock:
+            _spans.append(record)
+
+# Spans for one stage plus shared ones (such as the model load) that have no stage
+def spans(stage=None):
+    with _lock:
+        return [dict(s) for s in _spans if stage is None or s["stage"] in (stage, None)]
+
+def export_chrome_trace(path):
+    events = []
+    pid = os.getpid()
+    for s in spans():
+        args = {k: v for k, v in s.items() if k not in ("name", "start_ms", "wall_ms", "thread")}
+        events.append({
+            "name": s["name"],
+            "cat": s["stage"] or "shared",
+            "ph": "X",
+            "ts": int(s["start_ms"] * 1000),
+            "dur": int(s["wall_ms"] * 1000),
+            "pid": pid,
+            "tid": s["thread"],
+            "args": args,
+        })
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    print(f"Wrote Chrome trace to {path}")
+
+# TRACE_FILE=<path> exports every span recorded by the process as a Chrome trace on exit
+if os.getenv("TRACE_FILE"):
+    atexit.register(export_chrome_trace, os.getenv("TRACE_FILE"))
@@ -1,50 +1,116 @@
 import json
+import os
 import sqlite3
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
+from llm_client import generate_texts
+from retrieval_index import DB_PATH as INDEX_DB_PATH, context_lines
 
-# Initialize GPT-2
-tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
-model = GPT2LMHeadModel.from_pretrained("gpt2")
+DB_PATH = 'training_data.db'
+BATCH_SIZE = int(os.getenv("TRAIN_BATCH_SIZE", "8"))
+MAX_DB_WORKERS = int(os.getenv("TRAIN_DB_WORKERS", "4"))
+MAX_NEW_TOKENS = 50
+# Retrieved snippets are clipped so the prompt stays short next to the generated tokens
+MAX_CONTEXT_CHARS = 160
+# Agents whose stage writes <stage>_report.json; the others query history across every stage
+REPORT_STAGES = ("build", "test", "deploy")
 
-def train_agent(agent_name):
-    conn = sqlite3.connect('training_data.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS training_data
-                 (agent_name TEXT, timestamp TEXT, summary TEXT)''')
-    
-    # Load historical data
-    c.execute("SELECT summary FROM training_data WHERE agent_name = ? ORDER BY timestamp DESC LIMIT 5", (agent_name,))
-    data = [json.loads(row[0]) for row in c.fetchall()]
-    
-    # Use GPT-2 for training insights
-    prompt = f"Agent: {agent_name}\nTraining data: {json.dumps(data[:5])}\nSuggest improvements for {agent_name} performance."
-    inputs = tokenizer(prompt, return_tensors="pt", max_length=512, truncation=True)
-    outputs = model.generate(
-        inputs["input_ids"],
-        max_length=50,
-        num_return_sequences=1,
-        temperature=0.7,
-        pad_token_id=tokenizer.eos_token_id
-    )
-    response_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    
-    summary = {
-        "agent_name": agent_name,
-        "training_timestamp": datetime.now().isoformat(),
-        "suggestions": response_text[:100]
-    }
-    
-    c.execute('INSERT INTO training_data VALUES (?, ?, ?)',
-              (agent_name, datetime.now().isoformat(), json.dumps(summary)))
+def init_db():
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('''CREATE TABLE IF NOT EXISTS training_data
+                    (agent_name TEXT, timestamp TEXT, summary TEXT)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_training_data_agent
+                    ON training_data (agent_name, timestamp)''')
     conn.commit()
     conn.close()
-    
-    print(json.dumps(summary, indent=2))
+
+# Agents that already have at least one stored summary
+def agents_with_history():
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute("SELECT DISTINCT agent_name FROM training_data ORDER BY agent_name").fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+# Query the report index with the agent's latest issues, falling back to a generic failure query
+def retrieve_context(agent_name, db_path=INDEX_DB_PATH):
+    stage = agent_name if agent_name in REPORT_STAGES else None
+    query = f"{agent_name} failed error"
+    path = f"{stage}_report.json"
+    if stage and os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                issues = json.load(f).get("issues", [])
+            query = " ".join(issues) or query
+        except Exception as e:
+            print(f"Failed to read {path}: {str(e)}")
+    return context_lines(query, stage=stage, db_path=db_path)
+
+def build_prompt(agent_name, context):
+    history = "\n".join(line[:MAX_CONTEXT_CHARS] for line in context) if context else "- none recorded"
+    return f"Agent: {agent_name}\nRelevant history:\n{history}\nSuggest improvements for {agent_name} performance."
+
+# Training insights from the shared backend: the inference server when INFERENCE_SOCKET answers,
+# else GPT-2 in this process. Prompts of a failed batch come back as None and are skipped.
+def generate_suggestions(prompts):
+    return generate_texts(prompts, max_new_tokens=MAX_NEW_TOKENS, stage="train", batch_size=BATCH_SIZE)
+
+def train_agents(agent_names):
+    started = time.perf_counter()
+    init_db()
+    if not agent_names:
+        print("No agents to train")
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(MAX_DB_WORKERS, len(agent_names))) as executor:
+        contexts = list(executor.map(retrieve_context, agent_names))
+
+    prompts = [build_prompt(name, context) for name, context in zip(agent_names, contexts)]
+    responses = generate_suggestions(prompts)
+
+    summaries = []
+    rows = []
+    for agent_name, response_text in zip(agent_names, responses):
+        if response_text is None:
+            continue
+        timestamp = datetime.now().isoformat()
+        summary = {
+            "agent_name": agent_name,
+            "training_timestamp": timestamp,
+            "suggestions": response_text[:100]
+        }
+        summaries.append(summary)
+        rows.append((agent_name, timestamp, json.dumps(summary)))
+
+    # Commit every summary in a single transaction
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        with conn:
+            conn.executemany('INSERT INTO training_data VALUES (?, ?, ?)', rows)
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    agents_per_minute = len(agent_names) / elapsed * 60 if elapsed > 0 else 0.0
+    for summary in summaries:
+        print(json.dumps(summary, indent=2))
+    print(f"Trained {len(summaries)} of {len(agent_names)} agent(s) in {elapsed:.2f}s ({agents_per_minute:.1f} agents/min)")
+    return summaries
+
+def train_agent(agent_name):
+    return train_agents([agent_name])
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python train_agents.py <agent_name>")
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python train_agents.py <agent_name> [<agent_name> ...] | --all")
+        sys.exit(1)
+    if args == ["--all"]:
+        init_db()
+        args = agents_with_history()
+    if args and not train_agents(args):
+        print("No agent was trained")
         sys.exit(1)
-    train_agent(sys.argv[1])